@@ -0,0 +1,44 @@
+#!/usr/bin/python3
+
+import sys, os.path, runpy
+from sys import argv
+
+# one command for every compile script - "gbacompile.py nes roms/ -c" runs pocketnes_compile.py with the rest of the
+# arguments. Only the selected script's module is imported, so starting a build costs the same whichever system it's for
+systems = {
+	"nes": "pocketnes_compile",
+	"gb": "goomba_compile",
+	"sms": "smsadvance_compile",
+	"col": "cologne_compile",
+	"msx": "msxadvance_compile",
+	"ngp": "ngpgba_compile",
+	"sv": "wasabi_compile",
+	"pce": "pceadvance_compile",
+	"snes": "snesadvance_compile",
+	"snezzi": "snezziboy_compile",
+	"fds": "hvca_compile",
+	"zx": "zxadvance_compile",
+	"mixed": "mixed_compile",
+}
+
+def usage():
+	lines = ["usage: gbacompile.py SYSTEM [options] ...", "", "systems:"]
+	for system, module in systems.items():
+		lines.append('  {:<9}{}.py'.format(system, module))
+	lines.append("")
+	lines.append("use gbacompile.py SYSTEM -h for the options of each system")
+	return "\n".join(lines)
+
+
+if __name__ == "__main__":
+
+	if len(argv) < 2 or argv[1] in ("-h", "--help"):
+		print(usage())
+	elif argv[1] not in systems:
+		sys.exit(f'unknown system - {argv[1]}\n\n{usage()}')
+	else:
+		# the compile scripts find their emulator binaries next to themselves, which run_module arranges by setting
+		# argv[0] to the module's path. Importing (rather than running the file) lets Python use its bytecode cache
+		sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+		module = systems[argv.pop(1)]
+		runpy.run_module(module, run_name="__main__", alter_sys=True)
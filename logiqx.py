@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+
+import struct, unicodedata
+from romio import readindex, writeindex
+
+# Logiqx XML DATs (No-Intro, Redump, TOSEC) as a CRC32 to title index, so that the builders can title ROMs by their
+# contents rather than their filenames
+#
+# <datafile>
+#	<header>...</header>
+#	<game name="Title (Region)">
+#		<rom name="Title (Region).gb" size="262144" crc="1a2b3c4d" md5="..." sha1="..."/>
+#	</game>
+# </datafile>
+#
+# these DATs run to tens of MB, so they are read with a streaming parser and only once - the index is cached (see
+# romio.readindex) as a table of CRC32s followed by the titles, separated by NULs
+
+index_magic = b"LQX1"
+
+def asciititle(title):
+	# the emulators' menus only have ASCII fonts - accented letters lose their accents, anything else is dropped
+	return unicodedata.normalize("NFKD", title).encode('ascii', 'ignore').decode('ascii')
+
+def importdat(name):
+	import xml.etree.ElementTree as ElementTree
+	titles = {}
+	root = None
+	for event, element in ElementTree.iterparse(name, events=("start", "end")):
+		if root is None:
+			root = element
+		elif event == "end" and element.tag in ("game", "machine"):
+			title = asciititle(element.get("name", ""))
+			for rom in element.iter("rom"):
+				try:
+					crc = int(rom.get("crc"), 16)
+				except (TypeError, ValueError):
+					continue # a nodump, or a ROM listed without checksums
+				titles.setdefault(crc, title) # the first game with a CRC32 keeps it, e.g. over a later alternate
+			root.clear() # the games already read are released as the parse goes, keeping memory use flat
+	return titles
+
+def loaddat(name):
+	index = readindex(name, index_magic)
+	if index is not None and len(index) >= 4:
+		count = struct.unpack_from("<I", index)[0]
+		titles = index[4 + count * 4:].decode('ascii').split("\0") if count else []
+		if len(index) >= 4 + count * 4 and len(titles) == count: # otherwise the index is damaged, and is rebuilt
+			return dict(zip(struct.unpack_from("<%dI" % count, index, 4), titles))
+	titles = importdat(name)
+	payload = struct.pack("<I%dI" % len(titles), len(titles), *titles) + "\0".join(titles.values()).encode('ascii')
+	writeindex(name, index_magic, payload)
+	return titles
+
+def loadtitles(names):
+	# the titles from one or more DATs, the first DAT taking precedence where more than one has a CRC32
+	titles = {}
+	for name in reversed(names):
+		titles.update(loaddat(name))
+	return titles
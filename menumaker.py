@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+
+import struct
+from romio import loaddatabase, readindex, writeindex
+
+# PocketNES Menu Maker databases (pnesmmw.mdb), and databases in the same format for the other emulators
+#
+# CRC32|title|flags|follow
+#
+# flags and follow are the decimal values for the emulator's ROM header, and may each be followed by a comment. Lines
+# which don't start with a CRC32 are the database's own header. The database is cached as a binary index (see
+# romio.readindex)
+
+index_magic = b"PNX1"
+index_record_format = "<Iqq" # CRC32, flags, follow - a table of these is followed by the titles, separated by NULs
+
+def parserecord(record):
+	# a database line is crc|title|flags|follow, where flags and follow may be followed by comments
+	recorddata = record.split("|")
+	try:
+		crc = int(recorddata[0], 16)
+	except ValueError:
+		return None # the header line, or anything else which isn't a game
+	if len(recorddata) < 2:
+		return None
+	title = recorddata[1]
+	flags = 0
+	follow = 0
+	try:
+		if len(recorddata) > 2:
+			if recorddata[2] != "\n":
+				flagrecord = recorddata[2]
+				if " " in flagrecord:
+					flagrecord = flagrecord.split(" ")[0] # remove trailing comments
+				if flagrecord:
+					flags = int(flagrecord)
+		if len(recorddata) > 3:
+			if recorddata[3] != "\n":
+				followrecord = recorddata[3]
+				if " " in followrecord:
+					followrecord = followrecord.split(" ")[0] # remove trailing comments
+				if followrecord:
+					follow = int(followrecord)
+	except ValueError:
+		return None
+	return crc, title, flags, follow
+
+def loaddb(name):
+	# the database as a dict of CRC32 to (title, flags, follow), from its cached binary index when that's current
+	database = {}
+	index = readindex(name, index_magic)
+	if index is not None and len(index) >= 4:
+		count = struct.unpack_from("<I", index)[0]
+		tablesize = count * struct.calcsize(index_record_format)
+		titles = index[4 + tablesize:].decode("utf-8", "surrogateescape").split("\0")
+		if len(index) >= 4 + tablesize and len(titles) == count: # otherwise the index is damaged, and is rebuilt
+			for (crc, flags, follow), title in zip(struct.iter_unpack(index_record_format, index[4:4 + tablesize]), titles):
+				database[crc] = (title, flags, follow)
+			return database
+	for record in loaddatabase(name):
+		fields = parserecord(record)
+		if fields is not None:
+			database[fields[0]] = fields[1:] # a later record for the same CRC32 takes precedence
+	table = b"".join(struct.pack(index_record_format, crc, flags, follow) for crc, (title, flags, follow) in database.items())
+	titles = "\0".join(title for title, flags, follow in database.values()).encode("utf-8", "surrogateescape")
+	writeindex(name, index_magic, struct.pack("<I", len(database)) + table + titles)
+	return database
@@ -0,0 +1,148 @@
+#!/usr/bin/python3
+
+import sys, os.path, argparse, importlib
+from sys import argv
+from romio import findroms, sniffrom, romargument, RomFile
+
+# which builder each type of ROM is sent to, by the file extension which sniffrom() reports (or the ROM's own extension
+# when its header has no signature). MSX and Colecovision ROMs are both commonly named .rom, so a .rom file which isn't
+# recognised by its header is skipped rather than guessed at
+builders = {
+	".nes": "pocketnes_compile.py",
+	".gb": "goomba_compile.py",
+	".gbc": "goomba_compile.py",
+	".sms": "smsadvance_compile.py",
+	".gg": "smsadvance_compile.py",
+	".sg": "smsadvance_compile.py",
+	".col": "cologne_compile.py",
+	".ngp": "ngpgba_compile.py",
+	".ngc": "ngpgba_compile.py",
+	".sv": "wasabi_compile.py",
+	".pce": "pceadvance_compile.py",
+	".iso": "pceadvance_compile.py",
+	".sfc": "snesadvance_compile.py",
+	".smc": "snesadvance_compile.py",
+	".fds": "hvca_compile.py",
+	".nsf": "hvca_compile.py",
+	".cfg": "hvca_compile.py",
+	".z80": "zxadvance_compile.py",
+	".sna": "zxadvance_compile.py",
+}
+sniffed_only = {".rom": "msxadvance_compile.py"}
+rom_extensions = tuple(builders) + tuple(sniffed_only) # accepted when searching folders and wildcards
+no_clean_option = ("goomba_compile.py",) # builders without the -c option
+
+def route(rom, snes):
+	# the compile script for the ROM and the type of ROM it was identified as, or None for both if it isn't recognised
+	sniffed = sniffrom(rom)
+	romtype = os.path.splitext(rom.name)[1].lower()
+	if sniffed is None and romtype not in builders:
+		return None, None
+	builder = builders.get(sniffed or romtype) or sniffed_only.get(sniffed)
+	if builder == "snesadvance_compile.py":
+		builder = snes
+	return builder, sniffed or romtype
+
+def accepted(rom, builder):
+	# the compile scripts tell ROMs apart by their file extensions, so one which was identified by its header as another
+	# system's ROM can't be sent to that system's script until it's renamed
+	module = importlib.import_module(os.path.splitext(builder)[0])
+	return os.path.splitext(rom.name)[1].lower() in module.rom_extensions
+
+
+if __name__ == "__main__":
+
+	if os.path.dirname(argv[0]) and os.path.dirname(argv[0]) != ".":
+		localpath = os.path.dirname(argv[0]) + os.path.sep
+	else:
+		localpath = ""
+
+	parser = argparse.ArgumentParser(
+		fromfile_prefix_chars = '@',
+		description="This script sorts a mixed library of ROMs by system, identifying each one from the signatures in its header rather than just its file extension, then runs the build of the matching compile script for each system - producing one compilation per emulator. Each script's default emulator binary, BIOS and output filename are used.",
+		epilog="coded by patters in 2022"
+	)
+
+	parser.add_argument(
+		dest = 'romfile',
+		help = "ROM image, archive or folder to sort into compilations. Wildcards are also accepted, or use @listfile to read them from a text file, one per line.",
+		type = str,
+		nargs = '+'
+	)
+	parser.add_argument(
+		'-r',
+		help = "search folders recursively for ROMs",
+		action = 'store_true'
+	)
+	parser.add_argument(
+		'-snezzi',
+		help = "send SNES ROMs to snezziboy_compile.py (one GBA ROM per game) instead of snesadvance_compile.py",
+		action = 'store_true'
+	)
+	parser.add_argument(
+		'-n',
+		help = "only list which compile script each ROM would be sent to",
+		action = 'store_true'
+	)
+	parser.add_argument(
+		'-c',
+		help = "clean brackets from ROM titles",
+		action = 'store_true'
+	)
+	parser.add_argument(
+		'-sav',
+		help = "for EZ-Flash IV firmware 1.x - create a blank .sav file for each compilation",
+		action = 'store_true'
+	)
+	parser.add_argument(
+		'-pat',
+		help = "for EZ-Flash IV firmware 2.x - create a .pat file for each compilation",
+		action = 'store_true'
+	)
+	args = parser.parse_args()
+	args.romfile = findroms(args.romfile, rom_extensions, args.r)
+
+	snes = "snezziboy_compile.py" if args.snezzi else "snesadvance_compile.py"
+	groups = {}
+	for item in args.romfile:
+		builder, romtype = route(item, snes)
+		# the files and archive members opened to identify ROMs are closed or released again, as each builder reads its own
+		if isinstance(item, RomFile):
+			item.close()
+		elif item.contents is not None:
+			item.release()
+		if builder is None:
+			print('{:<24}{}'.format("(unrecognised)", item.name))
+			continue
+		if not accepted(item, builder):
+			print('{:<24}{} - skipped, this is a {} ROM, rename it for {}'.format("(wrong extension)", item.name, romtype, builder))
+			continue
+		groups.setdefault(builder, []).append(item)
+		if args.n:
+			print('{:<24}{}'.format(builder, item.name))
+
+	if not args.n:
+		failed = []
+		for builder, roms in groups.items():
+			print(f'{builder} - {len(roms)} ROM(s)')
+			options = []
+			if args.c and builder not in no_clean_option:
+				options.append("-c")
+			if args.sav:
+				options.append("-sav")
+			if args.pat:
+				options.append("-pat")
+			# each compile script is imported and its build() is run in this process, with the ROMs already found
+			module = importlib.import_module(os.path.splitext(builder)[0])
+			try:
+				builderargs = module.buildparser(localpath).parse_args(options + [romargument(roms[0])])
+				builderargs.romfile = roms
+				module.build(builderargs) # which raises an exception if the build fails
+				if builderargs.outputfile and builderargs.outputfile != "-" and not os.path.exists(builderargs.outputfile):
+					print(f'{builder} - {builderargs.outputfile} was not written')
+					failed.append(builder)
+			except (Exception, SystemExit) as error:
+				print(f'{builder} - {error}')
+				failed.append(builder)
+		if failed:
+			raise Exception(f'compilation failed - {", ".join(failed)}')
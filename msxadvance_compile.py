@@ -2,6 +2,8 @@
 
 import sys, os.path, struct, argparse, bz2, base64, zlib
 from sys import argv
+from romio import findroms, CompilationWriter, filesize, readrange, crc32file, prefetch, writeatomic, openstream, CACHE_HOME, preloaded
+from logiqx import loadtitles
 
 EMU_ID = int(0x1A4C4F43) # "COL",0x1A - probably unintentional since Formats.txt incorrectly states it should be "MSX",0x1A
 EMU_HEADER = 64
@@ -10,6 +12,10 @@ SRAM_SAVE = 65536
 default_outputfile = "msxadv-compilation.gba"
 default_emubinary = "msxadva.gba"
 default_bios = "bios.bin" # recommended to use 'MSX System v1.0 + MSX BASIC (1983)(Microsoft)[MSX.ROM]'
+default_database = "msxmappers.dat"
+mapper_cache = os.path.join(CACHE_HOME, "msxmappers.dat") # the mappers guessed for ROMs which aren't in the database
+mapper_numbers = {'KONAMI4': 1, 'KONAMI5': 2, 'ASCII8K': 3, 'ASCII16K': 4, 'RTYPE': 5}
+rom_extensions = (".rom",) # accepted when searching folders and wildcards
 header_struct_format = "<8I31sx" # https://docs.python.org/3/library/struct.html
 
 # ROM header
@@ -35,11 +41,13 @@ header_struct_format = "<8I31sx" # https://docs.python.org/3/library/struct.html
 #		contents = fh.read()
 #	return contents
 
-def writefile(name, contents):
-	with open(name, "wb") as fh:
-		fh.write(contents)
-		if name == default_outputfile:
-			print("...wrote", name)	
+def writefile(name, contents, stream=None):
+	if stream:
+		stream.addfile(name, contents)
+	else:
+		writeatomic(name, contents)
+	if name == default_outputfile:
+		print("...wrote", name)
 
 #def get_bit(value, n):
 #    return ((value >> n & 1) != 0)
@@ -50,20 +58,70 @@ def set_bit(value, n):
 #def clear_bit(value, n):
 #    return value & ~(1 << n)
 
+def loadmappers(name, titles=None):
+	# a mapper database as a dict of CRC32 to mapper name, from lines of CRC32|mapper|title - anything else is ignored.
+	# The titles are added to titles, if it is given
+	mappers = {}
+	try:
+		with open(name, encoding='latin-1') as fh:
+			for record in fh:
+				recorddata = record.rstrip("\r\n").split("|")
+				try:
+					crc = int(recorddata[0], 16)
+				except ValueError:
+					continue # the header lines
+				if len(recorddata) > 1 and recorddata[1].upper() in mapper_numbers:
+					mappers[crc] = recorddata[1].upper()
+					if titles is not None and len(recorddata) > 2:
+						titles[crc] = recorddata[2]
+	except FileNotFoundError:
+		pass
+	return mappers
+
+def savemappers(name, mappers, titles):
+	records = "".join(f'{crc:08x}|{mapper}|{titles.get(crc, "")}\n' for crc, mapper in sorted(mappers.items()))
+	try:
+		os.makedirs(os.path.dirname(name), exist_ok=True)
+		writeatomic(name, ("MSXAdvance mappers guessed by msxadvance_compile.py - CRC32|mapper|title\n" + records).encode('latin-1', 'replace'))
+	except OSError:
+		pass # without a cache the guesses are just made again next time
+
+# the mapper register writes (ld (nn),a) which suggest each mapper type
+mapper_writes = {
+	0x5000: ('KONAMI5',),
+	0x9000: ('KONAMI5',),
+	0xb000: ('KONAMI5',),
+	0x4000: ('KONAMI4',),
+	0x8000: ('KONAMI4',),
+	0xa000: ('KONAMI4',),
+	0x6800: ('ASCII8K',),
+	0x7800: ('ASCII8K',),
+	0x6000: ('KONAMI4', 'ASCII8K', 'ASCII16K'),
+	0x7000: ('KONAMI5', 'ASCII8K', 'ASCII16K'),
+	0x77ff: ('ASCII16K',),
+}
+
+def mapperwrites(romdata):
+	# the number of writes to each mapper type's registers
+	size = len(romdata)
+	typeGuess = {
+		'KONAMI4' : 0,
+		'KONAMI5' : 0,
+		'ASCII8K'  : 0,
+		'ASCII16K' : 0,
+	}
+	# each ld (nn),a is searched for as a whole with bytes.count, which scans at C speed rather than a byte at a
+	# time. None of these 3 byte sequences can overlap another occurrence of itself (no address contains 0x32), so
+	# the counts are exact. Like the original loop, a write in the ROM's last 3 bytes isn't counted
+	for address, mappertypes in mapper_writes.items():
+		count = romdata.count(b"\x32" + struct.pack("<H", address), 0, size - 1)
+		for mappertype in mappertypes:
+			typeGuess[mappertype] += count
+	return typeGuess
+
 def detectmapper(romdata):
+	# a guess at the mapper from the ROM's contents - ROMs listed in the mapper database (msxmappers.dat) don't need one
 	size = len(romdata)
-	crcval = zlib.crc32(romdata)
-	
-	#R-Type, various versions
-	if crcval == 0xa884911c or crcval == 0x5b14c736 or crcval == 0x827919e4 or crcval == 0x71e94fce:
-		return 'RTYPE'
-	if crcval == 0x2a019191:
-		return 'ASCII8K'
-	if crcval == 0xa3a51fbb:
-		return 'ASCII16K'
-	if crcval == 0x952bfaa4:
-		return 'KONAMI5'	
-	#not sure if the versions that don't use the RTYPE mapper are fully playable, but they seem to run ok
 
 	if size < 0x10000:
 		if (size <= 0x4000) and (romdata[0] == b'A') and (romdata[1] == b'B'):
@@ -93,31 +151,7 @@ def detectmapper(romdata):
 		#  with this instruction to the mapper-registers-addresses
 		#  occur.
 
-		typeGuess = {
-			'KONAMI4' : 0,
-			'KONAMI5' : 0,
-			'ASCII8K'  : 0,
-			'ASCII16K' : 0,
-		}
-		for i in range(0,size - 3):
-			if romdata[i] == 0x32:
-				value = struct.unpack("<H", romdata[i + 1:i + 3])[0]
-				if value == 0x5000 or value == 0x9000 or value == 0xb000:
-					typeGuess['KONAMI5'] += 1
-				elif value == 0x4000 or value == 0x8000 or value == 0xa000:
-					typeGuess['KONAMI4'] += 1
-				elif value == 0x6800 or value == 0x7800:
-					typeGuess['ASCII8K'] += 1
-				elif value == 0x6000:
-					typeGuess['KONAMI4'] += 1
-					typeGuess['ASCII8K'] += 1
-					typeGuess['ASCII16K'] += 1
-				elif value == 0x7000:
-					typeGuess['KONAMI5'] += 1
-					typeGuess['ASCII8K'] += 1
-					typeGuess['ASCII16K'] += 1
-				elif value == 0x77ff:
-					typeGuess['ASCII16K'] += 1
+		typeGuess = mapperwrites(romdata)
 
 		if typeGuess['ASCII8K']:
 			typeGuess['ASCII8K'] -= 1 # -1 -> max_int
@@ -129,24 +163,25 @@ def detectmapper(romdata):
 		return type
 
 
-if __name__ == "__main__":
-
-	if os.path.dirname(argv[0]) and os.path.dirname(argv[0]) != ".":
-		localpath = os.path.dirname(argv[0]) + os.path.sep
-	else:
-		localpath = ""
+def buildparser(localpath=""):
 
 	parser = argparse.ArgumentParser(
+		fromfile_prefix_chars = '@',
 		description="This script will assemble the MSXAdvance emulator, a BIOS and MSX1 ROMs into a Gameboy Advance ROM image. It is recommended to type the script name, then drag and drop multiple ROM files onto the shell window, then add any additional arguments as needed.",
 		epilog="coded by patters in 2022"
 	)
 
 	parser.add_argument(
 		dest = 'romfile',
-		help = ".rom image to add to compilation. Drag and drop multiple files onto your shell window.",
-		type = argparse.FileType('rb'),
+		help = ".rom image to add to compilation. Drag and drop multiple files onto your shell window. Folders and wildcards are also accepted, or use @listfile to read them from a text file, one per line.",
+		type = str,
 		nargs = '*' # it's possible to build a compilation with only a BIOS ROM
 	)
+	parser.add_argument(
+		'-r',
+		help = "search folders recursively for ROMs",
+		action = 'store_true'
+	)
 	parser.add_argument(
 		'-s',
 		dest = 'splashscreen',
@@ -182,15 +217,26 @@ if __name__ == "__main__":
 		help = "clean brackets from ROM titles",
 		action = 'store_true'
 	)
+	parser.add_argument(
+		'-dat',
+		help = "Logiqx XML DAT file (e.g. from No-Intro) to title the ROMs by their CRC32 instead of their filenames. Can be given more than once, the first file taking precedence",
+		type = str,
+		action = 'append'
+	)
 
 	# don't use FileType('wb') here because it writes a zero-byte file even if it doesn't parse the arguments correctly
 	parser.add_argument(
 		'-o',
 		dest = 'outputfile',
-		help = "compilation output filename, defaults to " + default_outputfile,
+		help = "compilation output filename, defaults to " + default_outputfile + ", or - to send it to stdout",
 		type = str,
 		default = default_outputfile
 	)
+	parser.add_argument(
+		'-tar',
+		help = "send the compilation and its .pat/.sav files to stdout as a tar archive, instead of writing them as files",
+		action = 'store_true'
+	)
 	parser.add_argument(
 		'-sav',
 		help = "for EZ-Flash IV firmware 1.x - create a blank 64KB .sav file for the compilation, store in the SAVER folder, not needed for firmware 2.x which creates its own blank saves",
@@ -206,97 +252,154 @@ if __name__ == "__main__":
 		help = "disable automatic selection of ROM mapper type",
 		action = 'store_true'
 	)
-	args = parser.parse_args()
+	parser.add_argument(
+		'-db',
+		dest = 'database',
+		help = "mapper database file (CRC32|mapper|title), defaults to " + localpath + default_database + ". ROMs which aren't in it have their mapper guessed from their contents, and the guess is cached in " + mapper_cache + " for the next build - add a ROM to the database to correct a wrong guess",
+		type = str,
+		default = localpath + default_database
+	)
+	return parser
 
+def build(args, stream=None, titles=None, mappers=None, emubinary=None):
 
-	compilation = args.emubinary.read()
+	emu = preloaded(args.emubinary, emubinary)
 
-	if args.splashscreen:
-		compilation = compilation + args.splashscreen.read()
+	if titles is None and args.dat:
+		titles = loadtitles(args.dat)
 
-	biosflag = 1
-	flags = 0
-	mapper = 0
-	follow = 0 # sprite or address follow for 'Unscaled (Auto)' display mode
-	bios = args.bios.read()
-	bios += b"\0" * ((4 - (len(bios)%4))%4)
-	biosfilename = os.path.split(args.bios.name)[1]
-	biosheader = struct.pack(header_struct_format, EMU_ID, len(bios), flags, follow, biosflag, mapper, 0, 0, biosfilename[:31].encode('ascii'))
-	compilation += biosheader + bios
+	if mappers is None and not args.nomap:
+		mappers = loadmappers(args.database)
+	guessedtitles = {}
+	guessed = loadmappers(mapper_cache, guessedtitles) if not args.nomap else {}
+	guesses = len(guessed)
 
-	if args.bb:
-		biosflag = 0
-		flags = 0
-		mapper = 0
-		follow = 0 # sprite or address follow for 'Unscaled (Auto)' display mode
-		empty = b"\xff" * 16384
-		emptyname = "-- Empty --"
-		emptyheader = struct.pack(header_struct_format, EMU_ID, len(empty), flags, follow, biosflag, mapper, 0, 0, emptyname.encode('ascii'))
-		compilation += emptyheader + empty
+	with CompilationWriter(args.outputfile, stream=stream) as compilation:
+
+		compilation.copyfrom(emu)
 
-	for item in args.romfile:
+		if args.splashscreen:
+			compilation.copyfrom(args.splashscreen)
 
-		biosflag = 0
+		biosflag = 1
 		flags = 0
-		follow = 0 # sprite or address follow for Unscaled (Auto) display mode
 		mapper = 0
-		mappername = ""
-
-		romfilename = os.path.split(item.name)[1]
-		romtype = os.path.splitext(romfilename)[1]
-		romtitle = os.path.splitext(romfilename)[0]
-		rom = item.read()
-		rom += b"\0" * ((4 - (len(rom)%4))%4)
-
-		if romtype.lower() == ".rom":
-
-			if "(E)" in romtitle or "(Europe)" in romtitle or "(EUR)" in romtitle:
-				flags = set_bit (flags, 0) # set PAL timing for EUR-only titles
+		follow = 0 # sprite or address follow for 'Unscaled (Auto)' display mode
+		biossize = filesize(args.bios)
+		biospad = (4 - (biossize%4))%4
+		biosfilename = os.path.split(args.bios.name)[1]
+		biosheader = struct.pack(header_struct_format, EMU_ID, biossize + biospad, flags, follow, biosflag, mapper, 0, 0, biosfilename[:31].encode('ascii'))
+		compilation.write(biosheader)
+		compilation.copyfrom(args.bios)
+		compilation.pad(biospad)
+
+		if args.bb:
+			biosflag = 0
+			flags = 0
+			mapper = 0
+			follow = 0 # sprite or address follow for 'Unscaled (Auto)' display mode
+			empty = b"\xff" * 16384
+			emptyname = "-- Empty --"
+			emptyheader = struct.pack(header_struct_format, EMU_ID, len(empty), flags, follow, biosflag, mapper, 0, 0, emptyname.encode('ascii'))
+			compilation.write(emptyheader + empty)
+
+		for item in prefetch(args.romfile):
+
+			biosflag = 0
+			flags = 0
+			follow = 0 # sprite or address follow for Unscaled (Auto) display mode
+			mapper = 0
+			mappername = ""
+
+			romfilename = os.path.split(item.name)[1]
+			romtype = os.path.splitext(romfilename)[1]
+			romtitle = os.path.splitext(romfilename)[0]
+			if titles is not None:
+				romtitle = titles.get(crc32file(item), romtitle) # the DAT's title, where it has this ROM
+			romsize = filesize(item)
+			rompad = (4 - (romsize%4))%4
+
+			if romtype.lower() == ".rom":
+
+				if "(E)" in romtitle or "(Europe)" in romtitle or "(EUR)" in romtitle:
+					flags = set_bit (flags, 0) # set PAL timing for EUR-only titles
+
+				if not args.nomap:
+					# mapper detection needs the whole (padded) ROM, otherwise it is copied straight from the file
+					rom = readrange(item, 0, romsize)
+					crc = zlib.crc32(rom)
+					rom += b"\0" * rompad
+					if crc in mappers:
+						mappername = mappers[crc]
+					else:
+						if crc not in guessed:
+							guessed[crc] = detectmapper(rom)
+							guessedtitles[crc] = romtitle
+						mappername = guessed[crc]
+					mapper = mapper_numbers.get(mappername, 0)
 
-			if not args.nomap:
-				mappername = detectmapper(rom)
-				if mappername == 'KONAMI4': mapper = 1
-				elif mappername == 'KONAMI5': mapper = 2
-				elif mappername == 'ASCII8K': mapper = 3
-				elif mappername == 'ASCII16K': mapper = 4
-				elif mappername == 'RTYPE': mapper = 5
+			else:
+				raise Exception(f'unsupported filetype for compilation - {romfilename}')
 
-		else:
-			raise Exception(f'unsupported filetype for compilation - {romfilename}')
+			if args.c:
+				romtitle = romtitle.split(" [")[0] # strip the square bracket parts of the name
+				romtitle = romtitle.split(" (")[0] # strip the bracket parts of the name
 
-		if args.c:
-			romtitle = romtitle.split(" [")[0] # strip the square bracket parts of the name
-			romtitle = romtitle.split(" (")[0] # strip the bracket parts of the name
+			if args.m:
+				if romsize <= 196608:
+					romtitle = "* " + romtitle[:29]
+				else:
+					romtitle = "  " + romtitle[:29]
+			else:
+				romtitle = romtitle[:31]
 
-		if args.m:
-			if os.path.getsize(item.name) <= 196608:
-				romtitle = "* " + romtitle[:29]
+			romheader = struct.pack(header_struct_format, EMU_ID, romsize + rompad, flags, follow, biosflag, mapper, 0, 0, romtitle.encode('ascii'))
+			compilation.write(romheader)
+			if args.nomap:
+				compilation.copyfrom(item)
+				compilation.pad(rompad)
 			else:
-				romtitle = "  " + romtitle[:29]
-		else:
-			romtitle = romtitle[:31]
+				compilation.write(rom)
+			compilation.checkpoint()
 
-		romheader = struct.pack(header_struct_format, EMU_ID, len(rom), flags, follow, biosflag, mapper, 0, 0, romtitle.encode('ascii'))
-		compilation += romheader + rom
+			print(romtitle.ljust(32), mappername)
 
-		print(romtitle.ljust(32), mappername)
+		if not args.romfile:
+			print("No ROMs specified, writing emulator and BIOS only")
 
-	if not args.romfile:
-		print("No ROMs specified, writing emulator and BIOS only")
-	writefile(args.outputfile, compilation)
+	if len(guessed) > guesses:
+		savemappers(mapper_cache, guessed, guessedtitles)
 
-	if not args.romfile:
-		parser.print_usage()
+	if args.outputfile == default_outputfile:
+		print("...wrote", args.outputfile)
 
 	if args.pat:
 		# EZ-Flash IV fw2.x GSS patcher metadata to force 64KB SRAM saves - for PATCH folder on SD card
 		patchname = os.path.splitext(args.outputfile)[0] + ".pat"
 		patchdata = b'QlpoOTFBWSZTWRbvmZEAAAT44fyAgIAAEUAAAACIAAQAAAQESaAAVEIaaGRoxBKeqQD1GTJoks40324rSIskHSFhIywXzTCaqwSzf4exCBTgBk/i7kinChIC3fMyIA=='
-		writefile(patchname, bz2.decompress(base64.b64decode(patchdata)))
+		writefile(patchname, bz2.decompress(base64.b64decode(patchdata)), stream)
 
 	if args.sav:
 		# EZ-Flash IV fw1.x blank save - for SAVER folder on SD card
 		savename = os.path.splitext(args.outputfile)[0] + ".sav"
 		saveempty = b"\xff" * SRAM_SAVE
-		if not os.path.exists(savename): # careful not to overwrite an existing save
-			writefile(savename, saveempty)
+		if stream or not os.path.exists(savename): # careful not to overwrite an existing save
+			writefile(savename, saveempty, stream)
+
+
+if __name__ == "__main__":
+
+	if os.path.dirname(argv[0]) and os.path.dirname(argv[0]) != ".":
+		localpath = os.path.dirname(argv[0]) + os.path.sep
+	else:
+		localpath = ""
+
+	parser = buildparser(localpath)
+	args = parser.parse_args()
+	args.romfile = findroms(args.romfile, rom_extensions, args.r)
+	stream = openstream(args, default_outputfile)
+	build(args, stream)
+	if not args.romfile:
+		parser.print_usage()
+	if stream:
+		stream.close()
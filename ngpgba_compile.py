@@ -2,6 +2,8 @@
 
 import sys, os.path, struct, argparse, bz2, base64
 from sys import argv
+from romio import findroms, CompilationWriter, filesize, crc32file, prefetch, writeatomic, openstream, preloaded
+from logiqx import loadtitles
 
 EMU_ID = int(0x1A50474E) # "NGP",0x1A
 EMU_HEADER = 64
@@ -9,6 +11,7 @@ SRAM_SAVE = 65536
 
 default_outputfile = "ngpgba-compilation.gba"
 default_emubinary = "NGPGBA.gba"
+rom_extensions = (".ngp", ".ngc") # accepted when searching folders and wildcards
 header_struct_format = "<8I31sx" # https://docs.python.org/3/library/struct.html
 
 # ROM header
@@ -30,11 +33,13 @@ header_struct_format = "<8I31sx" # https://docs.python.org/3/library/struct.html
 #		contents = fh.read()
 #	return contents
 
-def writefile(name, contents):
-	with open(name, "wb") as fh:
-		fh.write(contents)
-		if name == default_outputfile:
-			print("...wrote", name)	
+def writefile(name, contents, stream=None):
+	if stream:
+		stream.addfile(name, contents)
+	else:
+		writeatomic(name, contents)
+	if name == default_outputfile:
+		print("...wrote", name)
 
 #def get_bit(value, n):
 #    return ((value >> n & 1) != 0)
@@ -46,24 +51,25 @@ def set_bit(value, n):
 #    return value & ~(1 << n)
 
 
-if __name__ == "__main__":
-
-	if os.path.dirname(argv[0]) and os.path.dirname(argv[0]) != ".":
-		localpath = os.path.dirname(argv[0]) + os.path.sep
-	else:
-		localpath = ""
+def buildparser(localpath=""):
 
 	parser = argparse.ArgumentParser(
+		fromfile_prefix_chars = '@',
 		description="This script will assemble the NGPAdvance emulator and Neo Geo Pocket ROMs into a Gameboy Advance ROM image. It is recommended to type the script name, then drag and drop multiple ROM files onto the shell window, then add any additional arguments as needed.",
 		epilog="coded by patters in 2022"
 	)
 
 	parser.add_argument(
 		dest = 'romfile',
-		help = ".ngp or .ngc ROM image to add to compilation. Drag and drop multiple files onto your shell window.",
-		type = argparse.FileType('rb'),
+		help = ".ngp or .ngc ROM image to add to compilation. Drag and drop multiple files onto your shell window. Folders and wildcards are also accepted, or use @listfile to read them from a text file, one per line.",
+		type = str,
 		nargs = '+'
 	)
+	parser.add_argument(
+		'-r',
+		help = "search folders recursively for ROMs",
+		action = 'store_true'
+	)
 #	parser.add_argument(
 #		'-s',
 #		dest = 'splashscreen',
@@ -93,15 +99,26 @@ if __name__ == "__main__":
 		help = "clean brackets from ROM titles",
 		action = 'store_true'
 	)
+	parser.add_argument(
+		'-dat',
+		help = "Logiqx XML DAT file (e.g. from No-Intro) to title the ROMs by their CRC32 instead of their filenames. Can be given more than once, the first file taking precedence",
+		type = str,
+		action = 'append'
+	)
 
 	# don't use FileType('wb') here because it writes a zero-byte file even if it doesn't parse the arguments correctly
 	parser.add_argument(
 		'-o',
 		dest = 'outputfile',
-		help = "compilation output filename, defaults to " + default_outputfile,
+		help = "compilation output filename, defaults to " + default_outputfile + ", or - to send it to stdout",
 		type = str,
 		default = default_outputfile
 	)
+	parser.add_argument(
+		'-tar',
+		help = "send the compilation and its .pat/.sav files to stdout as a tar archive, instead of writing them as files",
+		action = 'store_true'
+	)
 	parser.add_argument(
 		'-sav',
 		help = "for EZ-Flash IV firmware 1.x - create a blank 64KB .sav file for the compilation, store in the SAVER folder, not needed for firmware 2.x which creates its own blank saves",
@@ -112,73 +129,104 @@ if __name__ == "__main__":
 		help = "for EZ-Flash IV firmware 2.x - create a .pat file for the compilation to force 64KB SRAM saves, store in the PATCH folder",
 		action = 'store_true'
 	)
-	args = parser.parse_args()
+	return parser
 
+def build(args, stream=None, titles=None, emubinary=None):
 
-	compilation = args.emubinary.read()
+	emu = preloaded(args.emubinary, emubinary)
 
-#	if args.splashscreen:
-#		compilation = compilation + args.splashscreen.read()
-
-#	if args.bios:
-#		biosflag = 1
-#		flags = 0
-#		follow = 0 # sprite or address follow for 'Unscaled (Auto)' display mode
-#		bios = args.bios.read()
-#		bios += b"\0" * ((4 - (len(bios)%4))%4)
-#
-#		biosfilename = os.path.split(args.bios.name)[1]
-#		biosheader = struct.pack(header_struct_format, EMU_ID, len(bios), flags, follow, biosflag, 0, 0, 0, biosfilename[:31].encode('ascii'))
-#		compilation += biosheader + bios
-#
-#		if args.bb:
-#			biosflag = 0
-#			flags = 0
-#			follow = 0 # sprite or address follow for 'Unscaled (Auto)' display mode
-#			empty = b"\xff" * 16384
-#			emptyname = "-- Empty --"
-#			emptyheader = struct.pack(header_struct_format, EMU_ID, len(empty), flags, follow, biosflag, 0, 0, 0, emptyname.encode('ascii'))
-#			compilation += emptyheader + empty
+	if titles is None and args.dat:
+		titles = loadtitles(args.dat)
 
-	for item in args.romfile:
+	with CompilationWriter(args.outputfile, stream=stream) as compilation:
 
-		biosflag = 0
-		flags = 0
-		follow = 0 # sprite or address follow for Unscaled (Auto) display mode
+		compilation.copyfrom(emu)
 
-		romfilename = os.path.split(item.name)[1]
-		romtitle = os.path.splitext(romfilename)[0]
-		romtype = os.path.splitext(romfilename)[1]
+#		if args.splashscreen:
+#			compilation.copyfrom(args.splashscreen)
 
-		if romtype.lower() == ".ngp" or romtype.lower() == ".ngc":
-			# no special cases
+#		if args.bios:
+#			biosflag = 1
+#			flags = 0
+#			follow = 0 # sprite or address follow for 'Unscaled (Auto)' display mode
+#			biossize = filesize(args.bios)
+#			biospad = (4 - (biossize%4))%4
+#
+#			biosfilename = os.path.split(args.bios.name)[1]
+#			biosheader = struct.pack(header_struct_format, EMU_ID, biossize + biospad, flags, follow, biosflag, 0, 0, 0, biosfilename[:31].encode('ascii'))
+#			compilation.write(biosheader)
+#			compilation.copyfrom(args.bios)
+#			compilation.pad(biospad)
+#
+#			if args.bb:
+#				biosflag = 0
+#				flags = 0
+#				follow = 0 # sprite or address follow for 'Unscaled (Auto)' display mode
+#				empty = b"\xff" * 16384
+#				emptyname = "-- Empty --"
+#				emptyheader = struct.pack(header_struct_format, EMU_ID, len(empty), flags, follow, biosflag, 0, 0, 0, emptyname.encode('ascii'))
+#				compilation.write(emptyheader + empty)
+
+		for item in prefetch(args.romfile):
+
+			biosflag = 0
 			flags = 0
-		else:
-			raise Exception(f'unsupported filetype for compilation - {romfilename}')
-
-		if args.c:
-			romtitle = romtitle.split(" [")[0] # strip the square bracket parts of the name
-			romtitle = romtitle.split(" (")[0] # strip the bracket parts of the name
-
-		romtitle = romtitle[:31]
-		rom = item.read()
-		rom += b"\0" * ((4 - (len(rom)%4))%4)
-		romheader = struct.pack(header_struct_format, EMU_ID, len(rom), flags, follow, biosflag, 0, 0, 0, romtitle.encode('ascii'))
-		compilation += romheader + rom
-
-		print('{:<32}{}'.format(romtitle,romtype.strip(".")))
-
-	writefile(args.outputfile, compilation)
+			follow = 0 # sprite or address follow for Unscaled (Auto) display mode
+
+			romfilename = os.path.split(item.name)[1]
+			romtitle = os.path.splitext(romfilename)[0]
+			if titles is not None:
+				romtitle = titles.get(crc32file(item), romtitle) # the DAT's title, where it has this ROM
+			romtype = os.path.splitext(romfilename)[1]
+
+			if romtype.lower() == ".ngp" or romtype.lower() == ".ngc":
+				# no special cases
+				flags = 0
+			else:
+				raise Exception(f'unsupported filetype for compilation - {romfilename}')
+
+			if args.c:
+				romtitle = romtitle.split(" [")[0] # strip the square bracket parts of the name
+				romtitle = romtitle.split(" (")[0] # strip the bracket parts of the name
+
+			romtitle = romtitle[:31]
+			romsize = filesize(item)
+			rompad = (4 - (romsize%4))%4
+			romheader = struct.pack(header_struct_format, EMU_ID, romsize + rompad, flags, follow, biosflag, 0, 0, 0, romtitle.encode('ascii'))
+			compilation.write(romheader)
+			compilation.copyfrom(item)
+			compilation.pad(rompad)
+			compilation.checkpoint()
+
+			print('{:<32}{}'.format(romtitle,romtype.strip(".")))
+
+	if args.outputfile == default_outputfile:
+		print("...wrote", args.outputfile)
 
 	if args.pat:
 		# EZ-Flash IV fw2.x GSS patcher metadata to force 64KB SRAM saves - for PATCH folder on SD card
 		patchname = os.path.splitext(args.outputfile)[0] + ".pat"
 		patchdata = b'QlpoOTFBWSZTWRbvmZEAAAT44fyAgIAAEUAAAACIAAQAAAQESaAAVEIaaGRoxBKeqQD1GTJoks40324rSIskHSFhIywXzTCaqwSzf4exCBTgBk/i7kinChIC3fMyIA=='
-		writefile(patchname, bz2.decompress(base64.b64decode(patchdata)))
+		writefile(patchname, bz2.decompress(base64.b64decode(patchdata)), stream)
 
 	if args.sav:
 		# EZ-Flash IV fw1.x blank save - for SAVER folder on SD card
 		savename = os.path.splitext(args.outputfile)[0] + ".sav"
 		saveempty = b"\xff" * SRAM_SAVE
-		if not os.path.exists(savename): # careful not to overwrite an existing save
-			writefile(savename, saveempty)
+		if stream or not os.path.exists(savename): # careful not to overwrite an existing save
+			writefile(savename, saveempty, stream)
+
+
+if __name__ == "__main__":
+
+	if os.path.dirname(argv[0]) and os.path.dirname(argv[0]) != ".":
+		localpath = os.path.dirname(argv[0]) + os.path.sep
+	else:
+		localpath = ""
+
+	args = buildparser(localpath).parse_args()
+	args.romfile = findroms(args.romfile, rom_extensions, args.r)
+	stream = openstream(args, default_outputfile)
+	build(args, stream)
+	if stream:
+		stream.close()
@@ -1,7 +1,10 @@
 #!/usr/bin/python3
 
-import sys, os.path, struct, argparse, bz2, base64
+import sys, os.path, struct, argparse, bz2, base64, re
 from sys import argv
+from romio import findroms, CompilationWriter, filesize, readrange, crc32file, prefetch, writeatomic, openstream, preloaded
+from logiqx import loadtitles
+from menumaker import loaddb
 
 EMU_ID = int(0x1A53454E) # "NES",0x1A - probably unintentional
 EMU_HEADER = 60
@@ -10,6 +13,8 @@ SRAM_SAVE = 65536 # not 8KB as advertised in readme.txt
 default_outputfile = "pceadv-compilation.gba"
 default_emubinary = "pceadvance.gba"
 default_cdrombios = "bios.bin"
+default_database = "pceadvance.mdb"
+rom_extensions = (".pce", ".iso") # accepted when searching folders and wildcards
 header_struct_format = "<31sx5I12s" # https://docs.python.org/3/library/struct.html
 
 # ROM header
@@ -29,17 +34,34 @@ header_struct_format = "<31sx5I12s" # https://docs.python.org/3/library/struct.h
 #	char unknown[12];
 #} romheader;
 
+# sprite follow settings for display mode: Unscaled (Auto), for games which aren't in the database, by a part of their
+# title (not case sensitive). These are all searched for at once by a single regular expression
+follow_titles = {
+	"1943": 9,
+	"aero blasters": 6,
+	"atomic robokid special": 0,
+	"devil crash": 11,
+	"devil's crush": 11,
+	"kyuukyoku tiger": 3,
+	"legendary axe": 14,
+	"raiden": 5,
+}
+# the longest first, so that where one title is part of another the more specific one is matched
+follow_matcher = re.compile("|".join(re.escape(title) for title in sorted(follow_titles, key=len, reverse=True)), re.IGNORECASE)
+
 
 def readfile(name):
 	with open(name, "rb") as fh:
 		contents = fh.read()
 	return contents
 
-def writefile(name, contents):
-	with open(name, "wb") as fh:
-		fh.write(contents)
-		if name == default_outputfile:
-			print("...wrote", name)	
+def writefile(name, contents, stream=None):
+	if stream:
+		stream.addfile(name, contents)
+	else:
+		writeatomic(name, contents)
+	if name == default_outputfile:
+		print("...wrote", name)
 
 #def get_bit(value, n):
 #    return ((value >> n & 1) != 0)
@@ -51,24 +73,25 @@ def set_bit(value, n):
 #    return value & ~(1 << n)
 
 
-if __name__ == "__main__":
-
-	if os.path.dirname(argv[0]) and os.path.dirname(argv[0]) != ".":
-		localpath = os.path.dirname(argv[0]) + os.path.sep
-	else:
-		localpath = ""
+def buildparser(localpath=""):
 
 	parser = argparse.ArgumentParser(
+		fromfile_prefix_chars = '@',
 		description="This script will assemble the PCEAdvance emulator, PC Engine/Turbografx-16 .pce ROM images, and .iso CD-ROM data tracks into a Gameboy Advance ROM image. It is recommended to type the script name, then drag and drop multiple ROM files onto the shell window, then add any additional arguments as needed.",
 		epilog="coded by patters in 2022"
 	)
 
 	parser.add_argument(
 		dest = 'romfile',
-		help = ".pce or .iso image to add to compilation. Drag and drop multiple files onto your shell window. Note that PCEAdvance supports only one CD-ROM game per compilation.",
-		type = argparse.FileType('rb'),
+		help = ".pce or .iso image to add to compilation. Drag and drop multiple files onto your shell window. Folders and wildcards are also accepted, or use @listfile to read them from a text file, one per line. Note that PCEAdvance supports only one CD-ROM game per compilation.",
+		type = str,
 		nargs = '+'
 	)
+	parser.add_argument(
+		'-r',
+		help = "search folders recursively for ROMs",
+		action = 'store_true'
+	)
 	parser.add_argument(
 		'-s',
 		dest = 'splashscreen',
@@ -89,6 +112,13 @@ if __name__ == "__main__":
 		type = argparse.FileType('rb'),
 		default = localpath + default_emubinary
 	)
+	parser.add_argument(
+		'-db',
+		dest = 'database',
+		help = "database file in the PocketNES Menu Maker format (CRC32|title|flags|follow) which stores the region and sprite follow settings of HuCard ROMs by CRC32, in place of matching their titles, defaults to " + localpath + default_database,
+		type = str,
+		default = localpath + default_database
+	)
 	parser.add_argument(
 		'-t',
 		dest = 'tcdfile',
@@ -100,15 +130,26 @@ if __name__ == "__main__":
 		help = "clean brackets from ROM titles",
 		action = 'store_true'
 	)
+	parser.add_argument(
+		'-dat',
+		help = "Logiqx XML DAT file (e.g. from No-Intro) to title the ROMs by their CRC32 instead of their filenames. Can be given more than once, the first file taking precedence",
+		type = str,
+		action = 'append'
+	)
 
 	# don't use FileType('wb') here because it writes a zero-byte file even if it doesn't parse the arguments correctly
 	parser.add_argument(
 		'-o',
 		dest = 'outputfile',
-		help = "compilation output filename, defaults to " + default_outputfile,
+		help = "compilation output filename, defaults to " + default_outputfile + ", or - to send it to stdout",
 		type = str,
 		default = default_outputfile
 	)
+	parser.add_argument(
+		'-tar',
+		help = "send the compilation and its .pat/.sav files to stdout as a tar archive, instead of writing them as files",
+		action = 'store_true'
+	)
 	parser.add_argument(
 		'-sav',
 		help = "for EZ-Flash IV firmware 1.x - create a blank 64KB .sav file for the compilation, store in the SAVER folder, not needed for firmware 2.x which creates its own blank saves",
@@ -124,138 +165,162 @@ if __name__ == "__main__":
 		help = "will, if needed, trim the compilation to fit into 16MB of PSRAM for Super CD-ROM support on EZ-Flash devices",
 		action = 'store_true'
 	)
+	return parser
 
-	args = parser.parse_args()
-
-
-	compilation = args.emubinary.read()
-
-	if args.splashscreen:
-		compilation += args.splashscreen.read()
-
-	iso_count = 0
-
-	for item in args.romfile:
-
-		flags = 0
-		follow = 0 # sprite or address follow for 'Unscaled (Auto)' display mode
-
-		romfilename = os.path.split(item.name)[1]
-		romtitle = os.path.splitext(romfilename)[0]
-		romtype = os.path.splitext(romfilename)[1]
-
-		# HuCard
-		if romtype.lower() == ".pce":
-			rom = item.read()
-			rom += b"\0" * ((4 - (len(rom)%4))%4)
-
-			# USA ROMs need this specific flag - remember, most will need to be decrypted first using PCEToy
-			if "(U)" in romtitle or "(USA)" in romtitle:
-				flags = set_bit (flags, 2)
-
-			# sprite follow settings for display mode: Unscaled (Auto)
-			if "1943" in romtitle:
-				follow = 9
-			if "aero blasters" in romtitle.lower():
-				follow = 6
-			if "atomic robokid special" in romtitle.lower():
-				follow = 0
-			if "devil crash" in romtitle.lower():
-				follow = 11
-			if "devil's crush" in romtitle.lower():
-				follow = 11
-			if "kyuukyoku tiger" in romtitle.lower():
-				follow = 3
-			if "legendary axe" in romtitle.lower():
-				follow = 14
-			if "raiden" in romtitle.lower():
-				follow = 5
-
-			if args.c:
-				romtitle = romtitle.split(" [")[0] # strip the square bracket parts of the name
-				romtitle = romtitle.split(" (")[0] # strip the bracket parts of the name
-
-			romtitle = romtitle[:31]
-
-			# unsure why 16 bytes are added to len(rom), but the original builder does this, despite that it pads the roms a lot more than 16b
-			# however, you can't add more than one rom to the compilation unless this is done
-			romheader = struct.pack(header_struct_format, romtitle.encode('ascii'), len(rom)+16, flags, follow, 0, EMU_ID, b"@           ")
-
-			compilation += romheader + rom
-
-		# CD-ROM
-		elif romtype.lower() == ".iso":
-			# only a single CD-ROM image is supported per compilation
-			if iso_count == 0:
-				# first data track ISO needs a CD-ROM BIOS + optional TCD tracklist first
-				cdbios = readfile(args.cdrombios)
-				cdbios += b"\0" * ((4 - (len(cdbios)%4))%4)
-				cdtitle = romtitle
-	
-				if args.c:
-					romtitle = romtitle.split(" [")[0] # strip the square bracket parts of the name
-					romtitle = romtitle.split(" (")[0] # strip the bracket parts of the name
+def build(args, stream=None, titles=None, database=None, emubinary=None):
 
-				romtitle = romtitle[:31]
+	emu = preloaded(args.emubinary, emubinary)
 
-				# use the ISO name for the cdbios entry in the rom list
-				cdromheader = struct.pack(header_struct_format, romtitle.encode('ascii'), len(cdbios)+16, flags, follow, 0, EMU_ID, b"@           ")
-				compilation += cdromheader + cdbios
+	if titles is None and args.dat:
+		titles = loadtitles(args.dat)
 
-				if args.tcdfile:
-					tracklist = args.tcdfile.read()
-				elif os.path.exists(romtitle + ".tcd"):
-					tracklist = readfile(romtitle + ".tcd")
-				else:
-					tracklist = b""
+	if database is None and os.path.exists(args.database):
+		database = loaddb(args.database)
+
+	with CompilationWriter(args.outputfile, stream=stream) as compilation:
 
-				cdrom = tracklist
+		compilation.copyfrom(emu)
 
-			# append data track (any subsequent tracks are simply concatenated - a TCD file is required for multiple data tracks)
-			cdrom += item.read()
-			iso_count += 1
-			if iso_count == 2 and tracklist == b"":
-				raise Exception('multiple ISO data tracks require a TCD tracklist, either named to match the first ISO, or defined via -t\n' +
-						'Note that PCEAdvance supports only a single CD-ROM game per compilation')
+		if args.splashscreen:
+			compilation.copyfrom(args.splashscreen)
 
-		else:
-			raise Exception(f'unsupported filetype for compilation - {romfilename}')
+		iso_count = 0
+		isofiles = []
 
-		print(romtitle)
+		for item in prefetch(args.romfile, (".pce",)): # CD-ROM tracks are only needed at the end
 
-	# finished iterating rom list, append any CD-ROM data
-	if iso_count:
-		compilation += cdrom
+			flags = 0
+			follow = 0 # sprite or address follow for 'Unscaled (Auto)' display mode
 
-		if args.trim:
-			# Super CD-ROM compilations cannot be larger than 16384-192KB or they won't fit into PSRAM
-			if "SCD" in cdtitle and len(compilation) > 16192 * 1024:
-				compilation = compilation[:16191 * 1024]
-				print("Warning: this Super CD-ROM compilation had to be truncated to fit within the 16192KB of remaining PSRAM - so YMMV")
+			romfilename = os.path.split(item.name)[1]
+			romtitle = os.path.splitext(romfilename)[0]
+			romtype = os.path.splitext(romfilename)[1]
 
-			# Arcade Card compilations cannot be larger than 14336-192KB or they won't fit into PSRAM
-			elif "ACD" in cdtitle and len(compilation) > 14144 * 1024:
-				compilation = compilation[:14143 * 1024]
-				print("Warning: this Arcade Card CD-ROM compilation had to be truncated to fit within the 14144KB of remaining PSRAM - so YMMV")
+			# HuCard
+			if romtype.lower() == ".pce":
+				crc = crc32file(item) if titles is not None or database is not None else None
+				if titles is not None:
+					romtitle = titles.get(crc, romtitle) # the DAT's title, where it has this ROM
+				romsize = filesize(item)
+				rompad = (4 - (romsize%4))%4
+
+				if database is not None and crc in database:
+					title, flags, follow = database[crc]
+				else:
+					# USA ROMs need this specific flag - remember, most will need to be decrypted first using PCEToy
+					if "(U)" in romtitle or "(USA)" in romtitle:
+						flags = set_bit (flags, 2)
+					followmatch = follow_matcher.search(romtitle)
+					if followmatch:
+						follow = follow_titles[followmatch.group(0).lower()]
+
+				if args.c:
+					romtitle = romtitle.split(" [")[0] # strip the square bracket parts of the name
+					romtitle = romtitle.split(" (")[0] # strip the bracket parts of the name
 
-			# CD-ROM compilations cannot be larger than 16384KB or they won't fit into PSRAM
-			elif len(compilation) > 16384 * 1024:
-				compilation = compilation[:16383 * 1024]
-				print("Warning: this CD-ROM compilation had to be truncated to fit within the 16MB of PSRAM - so YMMV")
-				print("         build this one with a CD-ROM BIOS, rather than a Super CD-ROM BIOS")
-				print("         or you will lose an additional 192KB of PSRAM")
+				romtitle = romtitle[:31]
 
-	writefile(args.outputfile, compilation)
+				# unsure why 16 bytes are added to len(rom), but the original builder does this, despite that it pads the roms a lot more than 16b
+				# however, you can't add more than one rom to the compilation unless this is done
+				romheader = struct.pack(header_struct_format, romtitle.encode('ascii'), romsize+rompad+16, flags, follow, 0, EMU_ID, b"@           ")
+
+				compilation.write(romheader)
+				compilation.copyfrom(item)
+				compilation.pad(rompad)
+				compilation.checkpoint()
+
+			# CD-ROM
+			elif romtype.lower() == ".iso":
+				# only a single CD-ROM image is supported per compilation
+				if iso_count == 0:
+					# first data track ISO needs a CD-ROM BIOS + optional TCD tracklist first
+					cdtitle = romtitle
+		
+					if args.c:
+						romtitle = romtitle.split(" [")[0] # strip the square bracket parts of the name
+						romtitle = romtitle.split(" (")[0] # strip the bracket parts of the name
+
+					romtitle = romtitle[:31]
+
+					# use the ISO name for the cdbios entry in the rom list
+					cdbiossize = os.path.getsize(args.cdrombios)
+					cdbiospad = (4 - (cdbiossize%4))%4
+					cdromheader = struct.pack(header_struct_format, romtitle.encode('ascii'), cdbiossize+cdbiospad+16, flags, follow, 0, EMU_ID, b"@           ")
+					compilation.write(cdromheader)
+					compilation.copyfile(args.cdrombios)
+					compilation.pad(cdbiospad)
+
+					if args.tcdfile:
+						tracklist = readrange(args.tcdfile, 0, filesize(args.tcdfile))
+					elif os.path.exists(romtitle + ".tcd"):
+						tracklist = readfile(romtitle + ".tcd")
+					else:
+						tracklist = b""
+
+				# append data track (any subsequent tracks are simply concatenated - a TCD file is required for multiple data tracks)
+				isofiles.append(item)
+				iso_count += 1
+				if iso_count == 2 and tracklist == b"":
+					raise Exception('multiple ISO data tracks require a TCD tracklist, either named to match the first ISO, or defined via -t\n' +
+							'Note that PCEAdvance supports only a single CD-ROM game per compilation')
+
+			else:
+				raise Exception(f'unsupported filetype for compilation - {romfilename}')
+
+			print(romtitle)
+
+		# finished iterating rom list, append any CD-ROM data
+		if iso_count:
+			compilation.write(tracklist)
+			for item in prefetch(isofiles):
+				compilation.copyfrom(item)
+				compilation.checkpoint()
+
+			if args.trim:
+				# Super CD-ROM compilations cannot be larger than 16384-192KB or they won't fit into PSRAM
+				if "SCD" in cdtitle and compilation.size > 16192 * 1024:
+					compilation.truncate(16191 * 1024)
+					print("Warning: this Super CD-ROM compilation had to be truncated to fit within the 16192KB of remaining PSRAM - so YMMV")
+
+				# Arcade Card compilations cannot be larger than 14336-192KB or they won't fit into PSRAM
+				elif "ACD" in cdtitle and compilation.size > 14144 * 1024:
+					compilation.truncate(14143 * 1024)
+					print("Warning: this Arcade Card CD-ROM compilation had to be truncated to fit within the 14144KB of remaining PSRAM - so YMMV")
+
+				# CD-ROM compilations cannot be larger than 16384KB or they won't fit into PSRAM
+				elif compilation.size > 16384 * 1024:
+					compilation.truncate(16383 * 1024)
+					print("Warning: this CD-ROM compilation had to be truncated to fit within the 16MB of PSRAM - so YMMV")
+					print("         build this one with a CD-ROM BIOS, rather than a Super CD-ROM BIOS")
+					print("         or you will lose an additional 192KB of PSRAM")
+
+	if args.outputfile == default_outputfile:
+		print("...wrote", args.outputfile)
 
 	if args.pat:
 		# EZ-Flash IV fw2.x GSS patcher metadata to force 64KB SRAM saves - for PATCH folder on SD card
 		patchname = os.path.splitext(args.outputfile)[0] + ".pat"
 		patchdata = b'QlpoOTFBWSZTWRbvmZEAAAT44fyAgIAAEUAAAACIAAQAAAQESaAAVEIaaGRoxBKeqQD1GTJoks40324rSIskHSFhIywXzTCaqwSzf4exCBTgBk/i7kinChIC3fMyIA=='
-		writefile(patchname, bz2.decompress(base64.b64decode(patchdata)))
+		writefile(patchname, bz2.decompress(base64.b64decode(patchdata)), stream)
 
 	if args.sav:
 		# EZ-Flash IV fw1.x blank save - for SAVER folder on SD card
 		savename = os.path.splitext(args.outputfile)[0] + ".sav"
 		saveempty = b"\xff" * SRAM_SAVE
-		if not os.path.exists(savename): # careful not to overwrite an existing save
-			writefile(savename, saveempty)
+		if stream or not os.path.exists(savename): # careful not to overwrite an existing save
+			writefile(savename, saveempty, stream)
+
+
+if __name__ == "__main__":
+
+	if os.path.dirname(argv[0]) and os.path.dirname(argv[0]) != ".":
+		localpath = os.path.dirname(argv[0]) + os.path.sep
+	else:
+		localpath = ""
+
+	args = buildparser(localpath).parse_args()
+	args.romfile = findroms(args.romfile, rom_extensions, args.r)
+	stream = openstream(args, default_outputfile)
+	build(args, stream)
+	if stream:
+		stream.close()
@@ -1,7 +1,10 @@
 #!/usr/bin/python3
 
-import sys, os.path, struct, argparse, bz2, base64, zlib
+import sys, os.path, struct, argparse, bz2, base64, zlib, re
 from sys import argv
+from romio import findroms, CompilationWriter, filesize, readrange, crc32file, prefetch, writeatomic, openstream, preloaded
+from menumaker import loaddb
+from titlematch import TitleIndex
 
 EMU_HEADER = 48
 NES_HEADER = 16
@@ -10,8 +13,22 @@ SRAM_SAVE = 65536
 default_outputfile = "pocketnes-compilation.gba"
 default_emubinary = "pocketnes.gba"
 default_database = "pnesmmw.mdb"
+rom_extensions = (".nes",) # accepted when searching folders and wildcards
 header_struct_format = "<31sx4I" # https://docs.python.org/3/library/struct.html
 
+# GoodNES tags, by the start of the tag - lower ranks are preferred by -best, and None is never used. Anything else
+# (pirate, trainer, hack) ranks 3. Translations count as a different game, not as a variant
+# https://emulation.gametechwiki.com/index.php/GoodTools
+variant_ranks = (
+	("!", 0),    # verified good dump
+	("T", 1),    # translation
+	("a", 2),    # alternate
+	("f", 2),    # fixed
+	("hM", 2),   # mapper hack, for emulators lacking the original mapper
+	("o", 4),    # overdump - works, but wastes cart space
+	("b", None), # bad dump
+)
+
 # ROM header
 #
 # from gba.h in the PocketNES source code and FORMATS.txt in the binary distribution, and testing with the Win32 builder
@@ -33,11 +50,13 @@ def readfile(name):
 		contents = fh.read()
 	return contents
 
-def writefile(name, contents):
-	with open(name, "wb") as fh:
-		fh.write(contents)
-		if name == default_outputfile:
-			print("...wrote", name)	
+def writefile(name, contents, stream=None):
+	if stream:
+		stream.addfile(name, contents)
+	else:
+		writeatomic(name, contents)
+	if name == default_outputfile:
+		print("...wrote", name)
 
 #def get_bit(value, n):
 #    return ((value >> n & 1) != 0)
@@ -48,25 +67,68 @@ def set_bit(value, n):
 #def clear_bit(value, n):
 #    return value & ~(1 << n)
 
+def romcrc(item):
+	if readrange(item, 0, 4) == b'NES\x1a':
+		# rom header is present, it needs to be removed to checksum only the rom data
+		return crc32file(item, NES_HEADER)
+	return crc32file(item)
+
+def variantrank(tags):
+	ranks = []
+	for tag in tags:
+		for prefix, rank in variant_ranks:
+			if tag.startswith(prefix):
+				break
+		else:
+			rank = 3
+		if rank is None:
+			return None
+		ranks.append(rank)
+	return max(ranks, default=1) # an untagged dump ranks below a verified one, but above any alternate
+
+def bestvariants(roms, database, crcs):
+	# only the best GoodNES variant of each game, in the order they were given. Games are told apart by their name
+	# without its tags, taken from the database where the CRC32 is known, so that renamed files are still grouped
+	best = {}
+	for index, item in enumerate(prefetch(roms)):
+		romtitle = os.path.splitext(os.path.split(item.name)[1])[0]
+		crcs[item] = romcrc(item)
+		if database is not None and crcs[item] in database:
+			romtitle = database[crcs[item]][0]
+		tags = re.findall(r"\[([^\]]*)\]", romtitle)
+		rank = variantrank(tags)
+		if rank is None:
+			print("bad dump skipped -", item.name)
+			continue
+		game = re.sub(r" ?\[(?!T[+-])[^\]]*\]", "", romtitle).lower()
+		candidate = (rank, tags, index, item)
+		if game not in best or candidate[:3] < best[game][:3]:
+			if game in best:
+				print("variant skipped -", best[game][3].name)
+			best[game] = candidate
+		else:
+			print("variant skipped -", item.name)
+	return [candidate[3] for candidate in sorted(best.values(), key=lambda candidate: candidate[2])]
 
-if __name__ == "__main__":
-
-	if os.path.dirname(argv[0]) and os.path.dirname(argv[0]) != ".":
-		localpath = os.path.dirname(argv[0]) + os.path.sep
-	else:
-		localpath = ""
+def buildparser(localpath=""):
 
 	parser = argparse.ArgumentParser(
+		fromfile_prefix_chars = '@',
 		description="This script will assemble the PocketNES emulator and NES ROMs into a Gameboy Advance ROM image. It is recommended to type the script name, then drag and drop multiple ROM files onto the shell window, then add any additional arguments as needed.",
 		epilog="coded by patters in 2022"
 	)
 
 	parser.add_argument(
 		dest = 'romfile',
-		help = ".nes ROM image to add to compilation. Drag and drop multiple files onto your shell window.",
-		type = argparse.FileType('rb'),
+		help = ".nes ROM image to add to compilation. Drag and drop multiple files onto your shell window. Folders and wildcards are also accepted, or use @listfile to read them from a text file, one per line.",
+		type = str,
 		nargs = '+'
 	)
+	parser.add_argument(
+		'-r',
+		help = "search folders recursively for ROMs",
+		action = 'store_true'
+	)
 	parser.add_argument(
 		'-s',
 		dest = 'splashscreen',
@@ -92,6 +154,16 @@ if __name__ == "__main__":
 		help = "use game titles from PocketNES Menu Maker database",
 		action = 'store_true'
 	)	
+	parser.add_argument(
+		'-nofuzzy',
+		help = "don't fall back to matching the ROM's name against database titles when its CRC32 isn't in the database (those matches are marked fz)",
+		action = 'store_true'
+	)
+	parser.add_argument(
+		'-best',
+		help = "keep only the best GoodNES variant of each game - verified [!] dumps, then untagged, then alternates, overdumps last, and never bad dumps [b]",
+		action = 'store_true'
+	)
 	parser.add_argument(
 		'-m',
 		help = "mark small ROMs suitable for link transfer",
@@ -107,10 +179,15 @@ if __name__ == "__main__":
 	parser.add_argument(
 		'-o',
 		dest = 'outputfile',
-		help = "compilation output filename, defaults to " + default_outputfile,
+		help = "compilation output filename, defaults to " + default_outputfile + ", or - to send it to stdout",
 		type = str,
 		default = default_outputfile
 	)
+	parser.add_argument(
+		'-tar',
+		help = "send the compilation and its .pat/.sav files to stdout as a tar archive, instead of writing them as files",
+		action = 'store_true'
+	)
 	parser.add_argument(
 		'-sav',
 		help = "for EZ-Flash IV firmware 1.x - create a blank 64KB .sav file for the compilation, store in the SAVER folder, not needed for firmware 2.x which creates its own blank saves",
@@ -121,106 +198,123 @@ if __name__ == "__main__":
 		help = "for EZ-Flash IV firmware 2.x - create a .pat file for the compilation to force 64KB SRAM saves, store in the PATCH folder",
 		action = 'store_true'
 	)
-	args = parser.parse_args()
+	return parser
 
+def build(args, stream=None, database=None, emubinary=None):
 
-	compilation = args.emubinary.read()
+	emu = preloaded(args.emubinary, emubinary)
 
-	# ensure the first ROM's data is 256 byte aligned (after headers) for optimal performance
-	# https://github.com/Dwedit/PocketNES/issues/5
-	compilation += b"\0" * ((256 - ((len(compilation) + EMU_HEADER + NES_HEADER)%256))%256) 
+	if database is None and os.path.exists(args.database):
+		database = loaddb(args.database)
 
-	if args.splashscreen:
-		compilation += args.splashscreen.read()
+	crcs = {} # those already computed while choosing the variants
+	romfiles = bestvariants(args.romfile, database, crcs) if args.best else args.romfile
 
-	for item in args.romfile:
+	with CompilationWriter(args.outputfile, stream=stream) as compilation:
 
-		flags = 0
-		follow = 0 # sprite or address follow for Unscaled (Auto) display mode
-		db_match = "  "
+		compilation.copyfrom(emu)
 
-		romfilename = os.path.split(item.name)[1]
-		romtype = os.path.splitext(romfilename)[1]
-		romtitle = os.path.splitext(romfilename)[0]
+		# ensure the first ROM's data is 256 byte aligned (after headers) for optimal performance
+		# https://github.com/Dwedit/PocketNES/issues/5
+		compilation.pad((256 - ((compilation.size + EMU_HEADER + NES_HEADER)%256))%256)
 
-		if romtype.lower() == ".nes":
+		if args.splashscreen:
+			compilation.copyfrom(args.splashscreen)
 
-			rom = item.read()
+		titleindex = None # only built if a ROM's CRC32 isn't in the database
 
-			if os.path.exists(args.database):
-				# use PocketNES Menu Maker database metadata for the roms, if the database is present
+		for item in prefetch(romfiles):
 
-				if rom[0:4] == b'NES\x1a':
-					# rom header is present, it needs to be removed to checksum only the rom data
-					romdata = rom[NES_HEADER:]
-				else:
-					romdata = rom
-				crcstr = hex(zlib.crc32(romdata))
-				crcstr = str(crcstr)[2:]
-
-				with open(args.database) as fh:
-					lines = fh.readlines()
-					for record in lines:
-						if crcstr in record:
-							db_match = "db"
-							recorddata = record.split("|")
-							if args.dbn:
-								romtitle = recorddata[1]
-							if len(recorddata) > 2:
-								if recorddata[2] != "\n":
-									flagrecord = recorddata[2]
-									if " " in flagrecord:
-										flagrecord = flagrecord.split(" ")[0] # remove trailing comments
-									if flagrecord:
-										flags = int(flagrecord)
-							if len(recorddata) > 3:
-								if recorddata[3] != "\n":
-									followrecord = recorddata[3]
-									if " " in followrecord:
-										followrecord = followrecord.split(" ")[0] # remove trailing comments
-									if followrecord:
-										follow = int(followrecord)
+			flags = 0
+			follow = 0 # sprite or address follow for Unscaled (Auto) display mode
+			db_match = "  "
 
-			else:
-				if "(E)" in romtitle or "(Europe)" in romtitle or "(EUR)" in romtitle:
-					flags = set_bit (flags, 2) # set PAL timing for EUR-only titles
+			romfilename = os.path.split(item.name)[1]
+			romtype = os.path.splitext(romfilename)[1]
+			romtitle = os.path.splitext(romfilename)[0]
+
+			if romtype.lower() == ".nes":
+
+				romsize = filesize(item)
+
+				if database is not None:
+					# use PocketNES Menu Maker database metadata for the roms, if the database is present
+
+					crc = crcs[item] if item in crcs else romcrc(item)
+
+					if crc in database:
+						db_match = "db"
+						title, flags, follow = database[crc]
+						if args.dbn:
+							romtitle = title
+					elif not args.nofuzzy:
+						# a hack or alternate dump - take the settings of the game with the closest title, but keep the ROM's own name
+						if titleindex is None:
+							titleindex = TitleIndex((key, record[0]) for key, record in database.items())
+						fuzzy = titleindex.match(romtitle)
+						if fuzzy:
+							db_match = "fz"
+							title, flags, follow = database[fuzzy[0]]
 
-			if args.m:
-				if os.path.getsize(item.name) <= 196608:
-					romtitle = "* " + romtitle
 				else:
-					romtitle = "  " + romtitle
+					if "(E)" in romtitle or "(Europe)" in romtitle or "(EUR)" in romtitle:
+						flags = set_bit (flags, 2) # set PAL timing for EUR-only titles
 
-			if args.c:
-				romtitle = romtitle.split(" [")[0] # strip the square bracket parts of the name
-				romtitle = romtitle.split(" (")[0] # strip the bracket parts of the name
+				if args.m:
+					if romsize <= 196608:
+						romtitle = "* " + romtitle
+					else:
+						romtitle = "  " + romtitle
 
-			romtitle = romtitle[:31]
+				if args.c:
+					romtitle = romtitle.split(" [")[0] # strip the square bracket parts of the name
+					romtitle = romtitle.split(" (")[0] # strip the bracket parts of the name
 
-		else:
-			raise Exception(f'unsupported filetype for compilation - {romfilename}')
+				romtitle = romtitle[:31]
 
-		# align rom data (after headers) on 256 byte boundaries for optimal performance
-		# https://github.com/Dwedit/PocketNES/issues/5
-		# https://en.wikipedia.org/wiki/Data_structure_alignment
-		rom += b"\0" * ((256 - ((len(rom) + EMU_HEADER)%256))%256)
+			else:
+				raise Exception(f'unsupported filetype for compilation - {romfilename}')
+
+			# align rom data (after headers) on 256 byte boundaries for optimal performance
+			# https://github.com/Dwedit/PocketNES/issues/5
+			# https://en.wikipedia.org/wiki/Data_structure_alignment
+			rompad = (256 - ((romsize + EMU_HEADER)%256))%256
 
-		romheader = struct.pack(header_struct_format, romtitle.encode('ascii'), len(rom), flags, follow, 0)
-		compilation += romheader + rom
+			romheader = struct.pack(header_struct_format, romtitle.encode('ascii'), romsize + rompad, flags, follow, 0)
+			compilation.write(romheader)
+			compilation.copyfrom(item)
+			compilation.pad(rompad)
+			compilation.checkpoint()
 
-		print(db_match, romtitle)
+			print(db_match, romtitle)
 
-	writefile(args.outputfile, compilation)
+	if args.outputfile == default_outputfile:
+		print("...wrote", args.outputfile)
 
 	if args.pat:
 		# EZ-Flash IV fw2.x GSS patcher metadata to force 64KB SRAM saves - for PATCH folder on SD card
 		patchname = os.path.splitext(args.outputfile)[0] + ".pat"
 		patchdata = b'QlpoOTFBWSZTWRbvmZEAAAT44fyAgIAAEUAAAACIAAQAAAQESaAAVEIaaGRoxBKeqQD1GTJoks40324rSIskHSFhIywXzTCaqwSzf4exCBTgBk/i7kinChIC3fMyIA=='
-		writefile(patchname, bz2.decompress(base64.b64decode(patchdata)))
+		writefile(patchname, bz2.decompress(base64.b64decode(patchdata)), stream)
 
 	if args.sav:
 		# EZ-Flash IV fw1.x blank save - for SAVER folder on SD card
 		savename = os.path.splitext(args.outputfile)[0] + ".sav"
 		saveempty = b"\xff" * SRAM_SAVE
-		if not os.path.exists(savename): # careful not to overwrite an existing save
-			writefile(savename, saveempty)
+		if stream or not os.path.exists(savename): # careful not to overwrite an existing save
+			writefile(savename, saveempty, stream)
+
+
+if __name__ == "__main__":
+
+	if os.path.dirname(argv[0]) and os.path.dirname(argv[0]) != ".":
+		localpath = os.path.dirname(argv[0]) + os.path.sep
+	else:
+		localpath = ""
+
+	args = buildparser(localpath).parse_args()
+	args.romfile = findroms(args.romfile, rom_extensions, args.r)
+	stream = openstream(args, default_outputfile)
+	build(args, stream)
+	if stream:
+		stream.close()
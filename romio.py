@@ -0,0 +1,1043 @@
+#!/usr/bin/python3
+
+import sys, os, glob, time, zlib, hashlib, threading, struct
+
+# zipfile, gzip, tarfile and concurrent.futures are imported where they're used, since between them they make up most
+# of a builder's start up time and a plain build of loose ROM files to a file needs none of them
+
+# shared output stage for the compilation builders
+#
+# the compilation is streamed to the output file as it is assembled, rather than being concatenated in memory and written
+# at the end, so memory use stays constant however many ROMs are added. ROM bodies which don't need to be modified are
+# copied file to file by the kernel where the platform allows it (copy_file_range on Linux, sendfile elsewhere)
+
+COPY_CHUNK = 1048576
+WRITE_WORKERS = min(8, os.cpu_count() or 1)
+MAX_OPEN_FILES = 32
+ARCHIVE_EXTENSIONS = (".zip", ".gz")
+STAGING_SUFFIX = ".part" # compilations are written under a temporary name, then renamed once complete
+CHECKPOINT_BYTES = 64 * 1048576 # how much is staged between syncs which make the checkpoints so far resumable
+HEAD_LIMIT = 0x20000 # header reads within this many bytes of the start of an archived ROM don't decompress the rest of it
+PATCH_EXTENSIONS = (".ips", ".bps", ".ups") # soft patches, applied by softpatch.py
+CACHE_HOME = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "gba-emu-compilation-builders")
+PATCH_CACHE = os.path.join(CACHE_HOME, "patched")
+MAX_PATCHED_ROMS = 64 # patched ROMs kept in PATCH_CACHE, the least recently used being removed first
+FILE_UMASK = os.umask(0o022) # only readable by setting it, so it is read once here and put straight back
+os.umask(FILE_UMASK)
+TAR_BLOCKSIZE = 512 # tarfile.BLOCKSIZE, which is only imported when a tar header is written
+
+class RomFile:
+
+	# A ROM named on the command line. Used as the argparse type in place of FileType('rb'), which opens every file while
+	# the arguments are parsed - huge ROM sets would then exceed the open file limit before any work started.
+	# The file is only opened when its data is actually needed, and no more than MAX_OPEN_FILES are kept open at once,
+	# the least recently used being closed first. Queued copies don't use this handle, the worker opens its own.
+
+	def __init__(self, name):
+		self.name = name
+		self.fh = None
+
+	def __repr__(self):
+		return f'RomFile({self.name!r})'
+
+	def __reduce__(self):
+		return RomFile, (self.name,) # sent to a worker process by name alone, to be opened there
+
+	def open(self):
+		if self.fh is None:
+			if len(open_files) >= MAX_OPEN_FILES:
+				open_files.pop(next(iter(open_files))).close() # reopened (at the start of the file) if it is needed again
+			self.fh = open(self.name, "rb")
+		else:
+			del open_files[self]
+		open_files[self] = self # re-inserted as the most recently used
+		return self.fh
+
+	def close(self):
+		if self.fh is not None:
+			open_files.pop(self, None)
+			self.fh.close()
+			self.fh = None
+
+	def fileno(self):
+		return self.open().fileno()
+
+	def read(self, size=-1):
+		return self.open().read(size)
+
+	def seek(self, offset, whence=0):
+		return self.open().seek(offset, whence)
+
+open_files = {} # insertion ordered, so the first key is the least recently used
+
+class ArchiveMember:
+
+	# A ROM inside a .zip or .gz archive, so that ROM libraries don't need to be extracted first.
+	# It is decompressed into memory when its data is first needed, streaming through the archive in chunks and
+	# computing the CRC32 on the way (the archive's own CRC is also verified by zipfile/gzip). prefetch() decompresses
+	# upcoming members in worker threads and releases each one once the builder has moved past it.
+
+	def __init__(self, archive, member=None):
+		self.archive = archive
+		self.member = member # None for a .gz, which holds a single file
+		if member is None:
+			self.name = os.path.splitext(archive)[0]
+		else:
+			self.name = os.path.join(archive, member)
+		self.contents = None
+		self.crc = None
+		self.position = 0
+		self.lock = threading.Lock()
+
+	def __repr__(self):
+		return f'ArchiveMember({self.name!r})'
+
+	def __reduce__(self):
+		return ArchiveMember, (self.archive, self.member) # a worker process decompresses it for itself
+
+	def size(self):
+		if self.contents is not None:
+			return len(self.contents)
+		if self.member is None:
+			# the gzip trailer ends with the uncompressed size (modulo 4GB, which is plenty for a ROM)
+			with open(self.archive, "rb") as fh:
+				fh.seek(-4, os.SEEK_END)
+				return int.from_bytes(fh.read(4), byteorder='little')
+		import zipfile
+		with zipfile.ZipFile(self.archive) as archive:
+			return archive.getinfo(self.member).file_size
+
+	def unpack(self):
+		import gzip, zipfile
+		if self.member is None:
+			return gzip.open(self.archive, "rb")
+		archive = zipfile.ZipFile(self.archive)
+		member = archive.open(self.member)
+		member.close = lambda close=member.close: (close(), archive.close())
+		return member
+
+	def data(self):
+		with self.lock:
+			if self.contents is None:
+				contents = bytearray()
+				crc = 0
+				with self.unpack() as fh:
+					while True:
+						chunk = fh.read(COPY_CHUNK)
+						if not chunk:
+							break
+						crc = zlib.crc32(chunk, crc)
+						contents += chunk
+				self.contents = bytes(contents)
+				self.crc = crc
+			return self.contents
+
+	def head(self, count):
+		# the first count bytes, without decompressing the rest of the member unless it is already in memory
+		with self.lock:
+			if self.contents is not None:
+				return self.contents[:count]
+		with self.unpack() as fh:
+			return fh.read(count)
+
+	def read(self, size=-1):
+		data = self.data()
+		end = len(data) if size < 0 else self.position + size
+		chunk = data[self.position:end]
+		self.position += len(chunk)
+		return chunk
+
+	def seek(self, offset, whence=0):
+		self.position = offset
+		return offset
+
+	def release(self):
+		with self.lock:
+			self.contents = None
+			self.position = 0
+
+class RomImage(ArchiveMember):
+
+	# A ROM which is already in memory, for programs which call build() with ROMs that aren't files
+
+	def __init__(self, name, contents):
+		self.name = name
+		self.archive = None
+		self.member = None
+		self.contents = bytes(contents)
+		self.crc = zlib.crc32(self.contents)
+		self.position = 0
+		self.lock = threading.Lock()
+
+	def __repr__(self):
+		return f'RomImage({self.name!r})'
+
+	def __reduce__(self):
+		return RomImage, (self.name, self.contents)
+
+	def data(self):
+		return self.contents
+
+	def release(self):
+		self.position = 0
+
+def preloaded(fh, contents):
+	# the emulator binary for build(), which a program running many builds can pass already read rather than have it
+	# read from the file again each time
+	return fh if contents is None else RomImage(fh.name, contents)
+
+class PatchedRom(ArchiveMember):
+
+	# A ROM with IPS, BPS or UPS patches applied - findroms() pairs each patch among the inputs with the ROM of the same
+	# name, or a "ROM|patch" argument names them both. The patched data is built in memory when it is first needed and
+	# cached in PATCH_CACHE along with its CRC32, keyed by the SHA-1 of the ROM and of each patch, so a rebuild doesn't
+	# apply the patches again and only the original ROMs need to be kept
+
+	def __init__(self, rom, patches):
+		self.rom = rom
+		self.patches = patches
+		self.name = rom.name
+		self.archive = None
+		self.member = None
+		self.contents = None
+		self.crc = None
+		self.position = 0
+		self.lock = threading.Lock()
+
+	def __repr__(self):
+		return f'PatchedRom({self.name!r}, {[patch.name for patch in self.patches]!r})'
+
+	def __reduce__(self):
+		return PatchedRom, (self.rom, self.patches)
+
+	def size(self):
+		return len(self.data())
+
+	def head(self, count):
+		return self.data()[:count]
+
+	def data(self):
+		with self.lock:
+			if self.contents is None:
+				contents = readrange(self.rom, 0, filesize(self.rom))
+				patches = [readrange(patch, 0, filesize(patch)) for patch in self.patches]
+				key = hashlib.sha1(hashlib.sha1(contents).digest())
+				for patch in patches:
+					key.update(hashlib.sha1(patch).digest())
+				cachename = os.path.join(PATCH_CACHE, key.hexdigest())
+				try:
+					with open(cachename, "rb") as fh:
+						cached = fh.read()
+				except OSError:
+					cached = b""
+				if len(cached) >= 4:
+					self.crc = int.from_bytes(cached[:4], byteorder='little')
+					self.contents = cached[4:]
+					try:
+						os.utime(cachename) # marked as recently used, see trimcache()
+					except OSError:
+						pass
+				else:
+					from softpatch import applypatch
+					for patch, patchdata in zip(self.patches, patches):
+						contents = applypatch(contents, patchdata, patch.name)
+					self.crc = zlib.crc32(contents)
+					self.contents = contents
+					try:
+						os.makedirs(PATCH_CACHE, exist_ok=True)
+						writeatomic(cachename, self.crc.to_bytes(4, byteorder='little') + contents)
+						trimcache(PATCH_CACHE, MAX_PATCHED_ROMS)
+					except OSError:
+						pass # the cache is only an optimisation
+				for src in [self.rom] + self.patches:
+					if isinstance(src, ArchiveMember):
+						src.release()
+			return self.contents
+
+def trimcache(folder, limit):
+	# remove the least recently used files from a cache folder until there are no more than limit
+	entries = []
+	for entry in os.scandir(folder):
+		try:
+			entries.append((entry.stat().st_mtime_ns, entry.path))
+		except OSError:
+			pass # removed by another build meanwhile
+	entries.sort()
+	for mtime, path in entries[:max(0, len(entries) - limit)]:
+		try:
+			os.remove(path)
+		except OSError:
+			pass
+
+def ispatch(name):
+	return os.path.splitext(name)[1].lower() in PATCH_EXTENSIONS
+
+def pairpatches(roms, explicit=()):
+	# apply each patch among the inputs to the ROM with the same name apart from the extension, in the same folder or
+	# archive - or failing that, the one ROM anywhere among the inputs with that filename. A patch which can't be paired
+	# is an error if it was named explicitly, but one which was only found by scanning a folder is skipped with a warning
+	patches = [rom for rom in roms if ispatch(rom.name)]
+	if not patches:
+		return roms
+	roms = [rom for rom in roms if not ispatch(rom.name)]
+	for patch in patches:
+		stem = os.path.splitext(patch.name)[0]
+		matches = [index for index, rom in enumerate(roms) if os.path.splitext(rom.name)[0] == stem]
+		if not matches:
+			stem = os.path.basename(stem)
+			matches = [index for index, rom in enumerate(roms) if os.path.splitext(os.path.basename(rom.name))[0] == stem]
+		if len(matches) != 1:
+			if patch in explicit:
+				raise Exception(f'no single ROM for patch - {patch.name}')
+			print(f'no single ROM for patch, skipped - {patch.name}', file=sys.stderr)
+			continue
+		rom = roms[matches[0]]
+		if isinstance(rom, PatchedRom):
+			if patch in explicit:
+				raise Exception(f'more than one patch for ROM, use a "ROM|patch|patch" argument to apply them in order - {rom.name}')
+			print(f'more than one patch for ROM, skipped {patch.name} - use a "ROM|patch|patch" argument to apply them in order - {rom.name}', file=sys.stderr)
+			continue
+		roms[matches[0]] = PatchedRom(rom, [patch])
+	return roms
+
+def archivemembers(path, extensions=None):
+	# the ROMs inside an archive, optionally only those with one of the given extensions
+	if path.lower().endswith(".gz"):
+		members = [ArchiveMember(path)]
+	else:
+		import zipfile
+		with zipfile.ZipFile(path) as archive:
+			members = [ArchiveMember(path, info.filename) for info in archive.infolist() if not info.is_dir()]
+		members.sort(key=lambda member: romsortkey(member.name))
+	if extensions is not None:
+		members = [member for member in members if os.path.splitext(member.name)[1].lower() in extensions]
+	return members
+
+def prefetch(roms, extensions=None):
+	# iterate over the ROMs, with the next few archived ones being decompressed in worker threads (zlib releases the
+	# GIL, so several archives really are decompressed at once). Each one is released after its turn, keeping memory
+	# use to a handful of ROMs however many there are. If extensions are given, only those are decompressed ahead
+	roms = list(roms)
+	if not any(isinstance(rom, ArchiveMember) for rom in roms):
+		yield from roms # loose files are read as they're copied, with nothing to decompress ahead
+		return
+	import concurrent.futures
+	pending = {}
+	with concurrent.futures.ThreadPoolExecutor(WRITE_WORKERS) as pool:
+		for index, rom in enumerate(roms):
+			for ahead in range(index, min(len(roms), index + WRITE_WORKERS)):
+				if isinstance(roms[ahead], ArchiveMember) and ahead not in pending:
+					if extensions is None or os.path.splitext(roms[ahead].name)[1].lower() in extensions:
+						pending[ahead] = pool.submit(roms[ahead].data)
+			if index in pending:
+				pending.pop(index).result() # raises here if the archive is corrupt
+			yield rom
+			if isinstance(rom, ArchiveMember):
+				rom.release()
+
+def scanfolder(path, extensions, recursive, found):
+	# os.scandir gets the file type from the directory listing itself, so no per-file stat is needed
+	with os.scandir(path) as entries:
+		for entry in entries:
+			if entry.is_dir(follow_symlinks=False):
+				if recursive:
+					scanfolder(entry.path, extensions, recursive, found)
+			elif os.path.splitext(entry.name)[1].lower() in extensions + ARCHIVE_EXTENSIONS:
+				found.append(entry.path)
+
+def romsortkey(path):
+	# alphabetical by filename, like a shell sorts a drag and drop selection, regardless of which subfolder it is in
+	name = os.path.basename(path)
+	return (name.lower(), name, path)
+
+def isarchive(path):
+	return os.path.splitext(path)[1].lower() in ARCHIVE_EXTENSIONS
+
+def findmember(name):
+	# "library.zip/Game (U).nes" names a single member of a zip archive
+	archive = os.path.dirname(name)
+	while archive and archive != os.path.dirname(archive):
+		if os.path.isfile(archive):
+			if archive.lower().endswith(".zip"):
+				import zipfile
+				member = os.path.relpath(name, archive).replace(os.sep, "/")
+				with zipfile.ZipFile(archive) as fh:
+					if member in fh.namelist():
+						return ArchiveMember(archive, member)
+			return None
+		archive = os.path.dirname(archive)
+	return None
+
+def romargument(rom):
+	# a command line argument which findroms() turns back into this ROM
+	if isinstance(rom, PatchedRom):
+		return "|".join([romargument(rom.rom)] + [romargument(patch) for patch in rom.patches])
+	if isinstance(rom, ArchiveMember):
+		if rom.member is None:
+			return rom.archive
+		return os.path.join(rom.archive, rom.member)
+	return rom.name
+
+def findfile(name, extensions):
+	# a single ROM or patch, for each part of a "ROM|patch" argument
+	if os.path.exists(name):
+		if isarchive(name):
+			members = archivemembers(name, None if name.lower().endswith(".gz") else extensions)
+			if len(members) != 1:
+				raise Exception(f'archive does not hold a single ROM or patch - {name}')
+			return members[0]
+		return RomFile(name)
+	member = findmember(name)
+	if member is None:
+		raise Exception(f'file not found - {name}')
+	return member
+
+def findroms(inputs, extensions, recursive=False):
+	# expand the romfile arguments into a list of RomFiles - each one can be a ROM, an archive, a folder, or a wildcard
+	# pattern (@listfile arguments have already been expanded by argparse). Folders and patterns only yield files (and
+	# archive members) with the builder's ROM extensions, whereas a file which is named explicitly is always passed through
+	extensions = tuple(extensions) + PATCH_EXTENSIONS # patches are picked up along with the ROMs, see pairpatches()
+	roms = []
+	explicit = set() # patches named as arguments themselves, rather than found in a folder
+	for name in inputs:
+		found = []
+		if "|" in name and not os.path.exists(name):
+			# "ROM|patch|patch" applies the patches to the ROM in that order, e.g. from the lines of an @listfile
+			rom, *patches = [findfile(part, extensions) for part in name.split("|")]
+			roms.append(PatchedRom(rom, patches))
+			continue
+		member = None if os.path.exists(name) else findmember(name)
+		if os.path.isdir(name):
+			scanfolder(name, extensions, recursive, found)
+		elif member:
+			roms.append(member)
+			continue
+		elif os.path.exists(name) or not any(char in name for char in "*?["):
+			# a literal filename (GoodTools names such as "Game (U) [!].nes" are not patterns)
+			if isarchive(name) and os.path.exists(name):
+				roms += archivemembers(name, None if name.lower().endswith(".gz") else extensions)
+			else:
+				roms.append(RomFile(name))
+				if ispatch(name):
+					explicit.add(roms[-1])
+			continue
+		else:
+			for match in glob.iglob(name, recursive=True):
+				if os.path.isdir(match):
+					scanfolder(match, extensions, recursive, found)
+				elif os.path.splitext(match)[1].lower() in extensions + ARCHIVE_EXTENSIONS:
+					found.append(match)
+		found.sort(key=romsortkey)
+		for path in found:
+			if isarchive(path):
+				roms += archivemembers(path, extensions)
+			else:
+				roms.append(RomFile(path))
+	return pairpatches(roms, explicit)
+
+def padding(size, alignment):
+	return (alignment - (size % alignment)) % alignment
+
+def filesize(fh):
+	if isinstance(fh, ArchiveMember):
+		return fh.size()
+	if isinstance(fh, RomFile):
+		return os.stat(fh.name).st_size # no need to open it just for this
+	return os.fstat(fh.fileno()).st_size
+
+def readrange(fh, offset, count):
+	if isinstance(fh, ArchiveMember):
+		if fh.contents is None and offset + count <= HEAD_LIMIT:
+			return fh.head(offset + count)[offset:] # header probes don't need the whole ROM
+		return bytes(memoryview(fh.data())[offset:offset+count])
+	if hasattr(os, "pread"):
+		return os.pread(fh.fileno(), count, offset)
+	fh.seek(offset)
+	return fh.read(count)
+
+def crc32file(fh, offset=0):
+	# CRC32 of everything from offset to the end of the file, read in chunks
+	if isinstance(fh, ArchiveMember):
+		data = fh.data()
+		if offset == 0:
+			return fh.crc # already computed while it was decompressed
+		return zlib.crc32(memoryview(data)[offset:])
+	crc = 0
+	while True:
+		chunk = readrange(fh, offset, COPY_CHUNK)
+		if not chunk:
+			break
+		crc = zlib.crc32(chunk, crc)
+		offset += len(chunk)
+	return crc
+
+GB_LOGO = bytes.fromhex("ceed6666cc0d000b03730083000c000d0008111f8889000edccc6ee6dddddd999bbbb67636e0eeccdddc999fbbb9333e")
+SNES_MAPMODES = (0x20, 0x21, 0x22, 0x23, 0x25, 0x30, 0x31, 0x32, 0x35, 0x3a)
+
+def snesheader(rom, offset):
+	# the checksum and its complement add up to 0xFFFF in a valid internal header, and the map mode byte is known
+	header = readrange(rom, offset, 0x20)
+	if len(header) < 0x20 or header[0x15] not in SNES_MAPMODES:
+		return False
+	complement = int.from_bytes(header[0x1C:0x1E], byteorder='little')
+	checksum = int.from_bytes(header[0x1E:0x20], byteorder='little')
+	return complement ^ checksum == 0xFFFF
+
+def sniffrom(rom):
+	# identify a ROM by the signatures in its header, reading only a few small ranges near the start of the file,
+	# and return the usual file extension for that type of ROM - or None if there's nothing conclusive, in which case
+	# the file's own extension is all there is to go on (ZX Spectrum snapshots, PC Engine and Supervision ROMs have no header)
+	head = readrange(rom, 0, 0x200).ljust(0x200, b"\0")
+	if head[:4] == b'NES\x1a':
+		return ".nes"
+	if head[:4] == b'FDS\x1a' or head[:15] == b'\x01*NINTENDO-HVC':
+		return ".fds"
+	if head[:5] == b'NESM\x1a':
+		return ".nsf"
+	if head[0x104:0x134] == GB_LOGO:
+		return ".gbc" if head[0x143] & 0x80 else ".gb"
+	if head[:28] in (b'COPYRIGHT BY SNK CORPORATION', b' LICENSED BY SNK CORPORATION'):
+		return ".ngc" if head[0x23] == 0x10 else ".ngp"
+	if head[:2] in (b'\xaa\x55', b'\x55\xaa'):
+		return ".col"
+	if head[:2] == b'AB' or readrange(rom, 0x4000, 2) == b'AB':
+		return ".rom" # MSX
+	for offset in (0x7FF0, 0x3FF0, 0x1FF0):
+		header = readrange(rom, offset, 16)
+		if header[:8] == b'TMR SEGA':
+			return ".gg" if header[15] >> 4 in (5, 6, 7) else ".sms"
+	copier = 512 if filesize(rom) % 1024 == 512 else 0 # an optional copier header before the ROM data
+	for offset in (0x7FC0, 0xFFC0):
+		if snesheader(rom, offset + copier):
+			return ".smc" if copier else ".sfc"
+	return None
+
+def copyrange(src, dst, offset, count):
+	# copy count bytes starting at offset in src to the current position of dst (both are file objects)
+	# returns the number of bytes copied, which is only short of count if src is truncated
+	try:
+		infd = src.fileno()
+		outfd = dst.fileno()
+	except (AttributeError, OSError):
+		infd = outfd = None # e.g. an in-memory stream, only the plain read/write loop will do
+	remaining = count
+
+	if remaining and infd is not None and hasattr(os, "copy_file_range"):
+		try:
+			while remaining:
+				copied = os.copy_file_range(infd, outfd, min(remaining, 0x7FFFF000), offset)
+				if not copied:
+					break
+				offset += copied
+				remaining -= copied
+		except OSError:
+			pass # e.g. EXDEV on older kernels, or an output which is a pipe - try the next method
+
+	if remaining and infd is not None and hasattr(os, "sendfile"):
+		try:
+			while remaining:
+				copied = os.sendfile(outfd, infd, offset, min(remaining, 0x7FFFF000))
+				if not copied:
+					break
+				offset += copied
+				remaining -= copied
+		except OSError:
+			pass # macOS and the BSDs can only sendfile to a socket
+
+	while remaining:
+		chunk = readrange(src, offset, min(remaining, COPY_CHUNK))
+		if not chunk:
+			break
+		writeall(dst, chunk)
+		offset += len(chunk)
+		remaining -= len(chunk)
+
+	return count - remaining
+
+def copyat(src, dst, offset, count, dstoffset):
+	# positional copy which neither uses nor moves either file position, so several can safely run at once
+	infd = src.fileno()
+	outfd = dst.fileno()
+	remaining = count
+
+	if remaining and hasattr(os, "copy_file_range"):
+		try:
+			while remaining:
+				copied = os.copy_file_range(infd, outfd, min(remaining, 0x7FFFF000), offset, dstoffset)
+				if not copied:
+					break
+				offset += copied
+				dstoffset += copied
+				remaining -= copied
+		except OSError:
+			pass
+
+	while remaining:
+		chunk = os.pread(infd, min(remaining, COPY_CHUNK), offset)
+		if not chunk:
+			break
+		view = memoryview(chunk)
+		while view:
+			written = os.pwrite(outfd, view, dstoffset)
+			view = view[written:]
+			dstoffset += written
+		offset += len(chunk)
+		remaining -= len(chunk)
+
+	return count - remaining
+
+def preallocate(fh, size):
+	# reserve the whole compilation up front, which also keeps it contiguous on disk
+	try:
+		os.posix_fallocate(fh.fileno(), 0, size)
+	except (AttributeError, OSError):
+		pass # not available on this platform or filesystem
+	if filesize(fh) != size:
+		os.ftruncate(fh.fileno(), size)
+
+def writeall(fh, data):
+	# raw (unbuffered) file objects may perform short writes
+	view = memoryview(data)
+	while view:
+		written = fh.write(view)
+		view = view[written:]
+
+def operationsize(operation):
+	kind, data = operation[0], operation[1:]
+	if kind == "write":
+		return len(data[0])
+	if kind == "pad":
+		return data[0] * len(data[1])
+	return data[2]
+
+def trimoperation(operation, size):
+	# the same operation, but only producing its first size bytes
+	kind, data = operation[0], operation[1:]
+	if kind == "write":
+		return (kind, data[0][:size])
+	if kind == "pad":
+		return (kind, size // len(data[1]), data[1])
+	return (kind, data[0], data[1], size)
+
+class OutputStream:
+
+	# Sends compilations to stdout instead of writing them as files (-o -), so they can be piped straight into ssh, tar
+	# or a compressor. With tar=True (-tar) they are sent as the members of a tar archive, along with their .pat and
+	# .sav files. Anything the builders print goes to stderr from then on, to keep it out of the data.
+	# When build() is called from another program, any writable binary file object can be given instead of stdout.
+
+	def __init__(self, tar, fh=None):
+		if fh is None:
+			sys.stdout.flush()
+			fh = open(sys.stdout.fileno(), "wb", buffering=0, closefd=False)
+			sys.stdout = sys.stderr
+		self.fh = fh
+		self.tar = tar
+
+	def begin(self, name, size):
+		if self.tar:
+			import tarfile
+			info = tarfile.TarInfo(os.path.basename(name))
+			info.size = size
+			info.mtime = int(time.time())
+			info.mode = 0o644
+			writeall(self.fh, info.tobuf(tarfile.PAX_FORMAT))
+
+	def end(self, size):
+		if self.tar:
+			writeall(self.fh, b"\0" * padding(size, TAR_BLOCKSIZE))
+
+	def addfile(self, name, contents):
+		self.begin(name, len(contents))
+		writeall(self.fh, contents)
+		self.end(len(contents))
+
+	def close(self):
+		if self.tar:
+			writeall(self.fh, b"\0" * TAR_BLOCKSIZE * 2) # end of archive
+
+def openstream(args, default_outputfile):
+	# -o - sends the compilation to stdout, -tar sends it and its .pat/.sav files to stdout as a tar archive
+	if args.tar:
+		if args.outputfile == "-":
+			args.outputfile = default_outputfile
+		return OutputStream(tar=True)
+	if args.outputfile == "-":
+		if args.pat or args.sav:
+			raise Exception('only the compilation can be sent to stdout, use -tar to include the .pat and .sav files')
+		return OutputStream(tar=False)
+	return None
+
+def loaddatabase(name, encoding=None):
+	# the lines of a text database - a service can load it once and pass it to build() for any number of compilations
+	with open(name, encoding=encoding) as fh:
+		return fh.readlines()
+
+# a binary index built from a text database is cached in INDEX_CACHE, named after the database and its full path, and
+# headed by the database's size, mtime and SHA-1. A changed mtime alone (a fresh copy, or a touch) only costs a rehash,
+# not a rebuild of the index
+INDEX_CACHE = os.path.join(CACHE_HOME, "indexes")
+INDEX_SUFFIX = ".idx"
+index_header_format = "<4sQQ20s"
+
+def indexname(name):
+	path = os.path.abspath(name)
+	return os.path.join(INDEX_CACHE, os.path.basename(path) + "-" + hashlib.sha1(path.encode()).hexdigest()[:16] + INDEX_SUFFIX)
+
+def readindex(name, magic, mapped=False):
+	# the payload of the cached index for the database name, or None if there isn't a current one. A mapped index is
+	# returned as a memoryview of the file mapped into memory, so only the pages which are looked at are read
+	try:
+		with open(indexname(name), "rb") as fh:
+			if mapped and os.fstat(fh.fileno()).st_size:
+				import mmap
+				contents = memoryview(mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ))
+			else:
+				contents = fh.read()
+	except OSError:
+		return None
+	headersize = struct.calcsize(index_header_format)
+	if len(contents) < headersize:
+		return None
+	cached_magic, size, mtime, digest = struct.unpack_from(index_header_format, contents)
+	stat = os.stat(name)
+	if cached_magic != magic or size != stat.st_size:
+		return None
+	if mtime != stat.st_mtime_ns:
+		if hashfile(name) != digest:
+			return None
+		writeindex(name, magic, bytes(contents[headersize:]), digest)
+	return contents[headersize:]
+
+def writeindex(name, magic, payload, digest=None):
+	# cache an index for a database - skipped quietly if the cache isn't writable, the index is only rebuilt next time
+	stat = os.stat(name)
+	if digest is None:
+		digest = hashfile(name)
+	try:
+		os.makedirs(INDEX_CACHE, exist_ok=True)
+		writeatomic(indexname(name), struct.pack(index_header_format, magic, stat.st_size, stat.st_mtime_ns, digest) + payload)
+	except OSError:
+		pass
+
+def hashfile(name):
+	digest = hashlib.sha1()
+	with open(name, "rb") as fh:
+		for chunk in iter(lambda: fh.read(COPY_CHUNK), b""):
+			digest.update(chunk)
+	return digest.digest()
+
+def writeatomic(name, contents):
+	# write a small file in full under a temporary name of its own, then rename it into place - so two builds writing
+	# the same file never share a staging file, the last one to finish simply replacing the other's
+	import tempfile
+	folder, filename = os.path.split(os.path.abspath(name))
+	fh = tempfile.NamedTemporaryFile(dir=folder, prefix=filename + ".", suffix=STAGING_SUFFIX, delete=False)
+	try:
+		with fh:
+			fh.write(contents)
+		os.chmod(fh.name, 0o666 & ~FILE_UMASK) # temporary files are private, but the file should be as open() leaves it
+		os.replace(fh.name, name)
+	except BaseException:
+		os.remove(fh.name)
+		raise
+
+def sourceid(src):
+	# what a copy is taken from, for the checkpoint journal - a changed source file invalidates the checkpoints after it
+	if isinstance(src, RomImage):
+		return repr((src.name, len(src.contents), src.crc)).encode()
+	if isinstance(src, PatchedRom):
+		return b"|".join([sourceid(src.rom)] + [sourceid(patch) for patch in src.patches])
+	if isinstance(src, ArchiveMember):
+		name, member = src.archive, src.member
+	else:
+		name, member = getattr(src, "name", src), None
+	stat = os.stat(name)
+	return repr((os.path.abspath(name), member, stat.st_size, stat.st_mtime_ns)).encode()
+
+def readjournal(name, size):
+	# the checkpoints of an interrupted build, as (size, recipe digest) pairs - only those within the staged data count
+	entries = []
+	try:
+		with open(name) as fh:
+			for line in fh:
+				fields = line.split()
+				if len(fields) != 2 or not line.endswith("\n") or int(fields[0]) > size:
+					break # the last line may be incomplete if the build was killed while it was being written
+				entries.append((int(fields[0]), fields[1]))
+	except (OSError, ValueError):
+		pass
+	return entries
+
+class CompilationWriter:
+
+	# Headers and alignment only depend on ROM sizes, so by the time the builder loop has finished, the final offset of
+	# every ROM body is known without any ROM data having been read. Where positional I/O is available the bodies are
+	# therefore only queued by copyfrom(), and once the layout is complete the output is preallocated and the bodies are
+	# filled in concurrently by a pool of worker threads (the copies release the GIL).
+	# Headers and any other data held in memory are written in place as they are produced.
+	#
+	# The compilation is staged as name.part and only renamed to name once it is complete, so an interrupted build never
+	# leaves a truncated .gba behind. The builders call checkpoint() after each ROM, and every CHECKPOINT_BYTES or so the
+	# staged data is synced and the checkpoint is logged in name.part.log, along with a digest of every operation which
+	# produced the data so far (source files are identified by path, size and mtime). When a build is run again with
+	# an interrupted staging file present, operations are only counted rather than performed for as long as the digests
+	# keep matching the log, then the staging file is truncated to the last matching checkpoint and the build carries on
+	# from there.
+
+	def __init__(self, name, workers=WRITE_WORKERS, stream=None):
+		self.name = name
+		self.stream = stream
+		self.staging = name + STAGING_SUFFIX
+		self.journalname = self.staging + ".log"
+		self.size = 0
+		self.jobs = []
+		self.recipe = hashlib.sha1()
+		self.logged = [] # checkpoints in the log, or about to be once the data they cover is synced
+		self.synced = 0 # how many of those are in the log
+		self.syncsize = 0
+		self.resumed = 0 # staged size up to the last matching checkpoint, while replaying
+		self.pending = [] # operations since then, which may need to be performed after all
+		self.replay = None
+		if stream:
+			# nothing is staged - the operations are only collected, then sent to the stream in order on close(),
+			# because a tar header needs the size up front and a pipe can't be truncated afterwards
+			self.fh = stream.fh
+			self.workers = 1
+			return
+		if os.path.exists(self.staging):
+			self.replay = readjournal(self.journalname, os.path.getsize(self.staging))
+		# unbuffered, so that kernel-side copies and our own writes always land at the same file position
+		if self.replay:
+			self.fh = open(self.staging, "r+b", buffering=0)
+		else:
+			self.replay = None
+			self.fh = open(self.staging, "wb", buffering=0)
+			if os.path.exists(self.journalname):
+				os.remove(self.journalname) # left over from an interrupted build with nothing worth resuming
+		if not (hasattr(os, "pwrite") and self.fh.seekable()):
+			workers = 1
+		self.workers = workers
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		if exc_type is not None:
+			self.abort()
+			return
+		try:
+			self.close()
+		except BaseException:
+			self.abort()
+			raise
+
+	def abort(self):
+		# keep the staging file for a later run to resume from, unless nothing in it was checkpointed
+		self.jobs = []
+		if self.stream:
+			return
+		self.fh.close()
+		if not os.path.exists(self.journalname):
+			os.remove(self.staging)
+
+	def perform(self, operation):
+		# record an operation in the recipe, then carry it out - or just count it while replaying an interrupted build
+		kind, data = operation[0], operation[1:]
+		if kind == "write":
+			self.recipe.update(b"w%d:" % len(data[0]))
+			self.recipe.update(data[0])
+		elif kind == "pad":
+			self.recipe.update(b"p%d:" % data[0] + data[1])
+		else:
+			self.recipe.update(b"c%d,%d:" % (data[1], data[2]) + sourceid(data[0]))
+		if self.replay is not None or self.stream:
+			self.pending.append(operation)
+			self.size += operationsize(operation)
+		else:
+			self.execute(operation)
+
+	def execute(self, operation):
+		kind, data = operation[0], operation[1:]
+		if kind == "write":
+			self.writedata(data[0])
+		elif kind == "pad":
+			self.paddata(*data)
+		else:
+			self.copydata(*data)
+
+	def write(self, data):
+		self.perform(("write", bytes(data) if self.replay is not None or self.stream else data))
+
+	def pad(self, count, fill=b"\0"):
+		if count:
+			self.perform(("pad", count, fill))
+
+	def copyfrom(self, src, offset=0, count=None):
+		# append a ROM body from an open file, without reading it into memory
+		if count is None:
+			count = filesize(src) - offset
+		self.perform(("copy", src, offset, count))
+
+	def copypatched(self, src, spans, offset=0, count=None):
+		# append a ROM body with (address, bytes) spans patched in on the way, so the ROM itself is still copied file to
+		# file and only the patched bytes are written from memory. The spans are sorted and don't overlap, and any
+		# beyond the end of the ROM are left out
+		if count is None:
+			count = filesize(src) - offset
+		position = 0
+		for address, payload in spans:
+			if address >= count:
+				break
+			if address > position:
+				self.copyfrom(src, offset + position, address - position)
+			payload = payload[:count - address]
+			self.write(payload)
+			position = address + len(payload)
+		if position < count:
+			self.copyfrom(src, offset + position, count - position)
+
+	def copyfile(self, name):
+		# append a whole file by name, it is only opened when its data is copied
+		self.perform(("copy", name, 0, os.stat(name).st_size))
+
+	def writedata(self, data):
+		if self.workers > 1:
+			view = memoryview(data)
+			offset = self.size
+			while view:
+				written = os.pwrite(self.fh.fileno(), view, offset)
+				view = view[written:]
+				offset += written
+		else:
+			writeall(self.fh, data)
+		self.size += len(data)
+
+	def paddata(self, count, fill):
+		if self.workers > 1 and fill == b"\0":
+			self.size += count # left as a hole, the output is zero filled when it is preallocated
+		else:
+			self.writedata(fill * count)
+
+	def copydata(self, src, offset, count):
+		if isinstance(src, ArchiveMember):
+			self.writedata(memoryview(src.data())[offset:offset+count]) # already decompressed into memory
+			return
+		if self.workers > 1:
+			if isinstance(src, RomFile):
+				src = src.name # opened by the worker when the copy runs
+			self.jobs.append((src, offset, count, self.size))
+			self.size += count
+			return
+		if isinstance(src, str):
+			with open(src, "rb") as fh:
+				copied = copyrange(fh, self.fh, offset, count)
+		else:
+			copied = copyrange(src, self.fh, offset, count)
+		self.size += copied
+		if copied != count:
+			raise Exception(f'unexpected end of file - {getattr(src, "name", src)}')
+
+	def checkpoint(self):
+		# the end of an entry (usually a ROM) which a rerun after an interruption can resume from
+		if self.stream:
+			return
+		entry = (self.size, self.recipe.hexdigest())
+		if self.replay is not None:
+			if self.replay[len(self.logged)] != entry:
+				self.resume()
+				self.checkpoint()
+				return
+			self.logged.append(entry)
+			self.synced = len(self.logged)
+			self.resumed = self.size
+			self.pending = []
+			if len(self.logged) == len(self.replay):
+				self.resume()
+			return
+		self.logged.append(entry)
+		if self.size - self.syncsize >= CHECKPOINT_BYTES:
+			self.sync()
+
+	def resume(self):
+		# stop replaying - drop whatever was staged after the last matching checkpoint and perform the operations since
+		if self.replay is None:
+			return
+		if len(self.logged) < len(self.replay):
+			writeatomic(self.journalname, "".join(f'{size} {digest}\n' for size, digest in self.logged).encode())
+		if len(self.logged):
+			print(f'...resuming {self.name} from {self.resumed} bytes')
+		self.replay = None
+		self.fh.truncate(self.resumed)
+		self.fh.seek(self.resumed)
+		self.size = self.syncsize = self.resumed
+		pending, self.pending = self.pending, []
+		for operation in pending:
+			self.execute(operation)
+
+	def sync(self):
+		# make the data so far durable, then log the checkpoints it covers
+		self.flush()
+		os.fsync(self.fh.fileno())
+		with open(self.journalname, "a") as fh:
+			fh.writelines(f'{size} {digest}\n' for size, digest in self.logged[self.synced:])
+		self.synced = len(self.logged)
+		self.syncsize = self.size
+
+	def runjob(self, job):
+		src, offset, count, dstoffset = job
+		if isinstance(src, str):
+			with open(src, "rb") as fh:
+				copied = copyat(fh, self.fh, offset, count, dstoffset)
+		else:
+			copied = copyat(src, self.fh, offset, count, dstoffset)
+		if copied != count:
+			raise Exception(f'unexpected end of file - {getattr(src, "name", src)}')
+
+	def flush(self):
+		# complete the layout - preallocate, then fill in all the queued ROM bodies
+		self.resume()
+		if self.workers > 1:
+			preallocate(self.fh, self.size)
+		if self.jobs:
+			import concurrent.futures
+			with concurrent.futures.ThreadPoolExecutor(self.workers) as pool:
+				for result in pool.map(self.runjob, self.jobs):
+					pass
+			self.jobs = []
+
+	def truncate(self, size):
+		if self.stream:
+			# nothing has been sent yet, so just drop whatever is past the new end
+			pending, self.pending, self.size = self.pending, [], 0
+			for operation in pending:
+				if self.size + operationsize(operation) > size:
+					operation = trimoperation(operation, size - self.size)
+				if operationsize(operation):
+					self.pending.append(operation)
+					self.size += operationsize(operation)
+			return
+		self.flush()
+		self.recipe.update(b"t%d:" % size)
+		self.fh.truncate(size)
+		self.fh.seek(size)
+		self.size = size
+
+	def close(self):
+		# sync, then rename the finished compilation into place
+		if self.stream:
+			if self.pending is not None:
+				pending, self.pending = self.pending, None
+				self.stream.begin(self.name, self.size)
+				self.size = 0
+				for operation in pending:
+					self.execute(operation)
+				self.stream.end(self.size)
+			return
+		if not self.fh.closed:
+			self.flush()
+			os.fsync(self.fh.fileno())
+			self.fh.close()
+			os.replace(self.staging, self.name)
+			if os.path.exists(self.journalname):
+				os.remove(self.journalname)
@@ -2,6 +2,9 @@
 
 import sys, os.path, struct, argparse, bz2, base64
 from sys import argv
+from romio import findroms, CompilationWriter, filesize, crc32file, prefetch, writeatomic, openstream, preloaded
+from logiqx import loadtitles
+from menumaker import loaddb
 
 EMU_ID = int(0x1A534D53) # "SMS",0x1A
 EMU_HEADER = 64
@@ -9,6 +12,8 @@ SRAM_SAVE = 65536
 
 default_outputfile = "smsadv-compilation.gba"
 default_emubinary = "smsadvance.gba"
+default_database = "smsadvance.mdb"
+rom_extensions = (".sms", ".gg", ".sg") # accepted when searching folders and wildcards
 header_struct_format = "<8I31sx" # https://docs.python.org/3/library/struct.html
 
 # ROM header
@@ -36,11 +41,13 @@ header_struct_format = "<8I31sx" # https://docs.python.org/3/library/struct.html
 #		contents = fh.read()
 #	return contents
 
-def writefile(name, contents):
-	with open(name, "wb") as fh:
-		fh.write(contents)
-		if name == default_outputfile:
-			print("...wrote", name)	
+def writefile(name, contents, stream=None):
+	if stream:
+		stream.addfile(name, contents)
+	else:
+		writeatomic(name, contents)
+	if name == default_outputfile:
+		print("...wrote", name)
 
 #def get_bit(value, n):
 #    return ((value >> n & 1) != 0)
@@ -52,24 +59,25 @@ def clear_bit(value, n):
     return value & ~(1 << n)
 
 
-if __name__ == "__main__":
-
-	if os.path.dirname(argv[0]) and os.path.dirname(argv[0]) != ".":
-		localpath = os.path.dirname(argv[0]) + os.path.sep
-	else:
-		localpath = ""
+def buildparser(localpath=""):
 
 	parser = argparse.ArgumentParser(
+		fromfile_prefix_chars = '@',
 		description="This script will assemble the SMSAdvance emulator and Master System/Game Gear/SG-1000 ROMs into a Gameboy Advance ROM image. It is recommended to type the script name, then drag and drop multiple ROM files onto the shell window, then add any additional arguments as needed.",
 		epilog="coded by patters in 2022"
 	)
 
 	parser.add_argument(
 		dest = 'romfile',
-		help = ".sms/.gg/.sg ROM image to add to compilation. Drag and drop multiple files onto your shell window.",
-		type = argparse.FileType('rb'),
+		help = ".sms/.gg/.sg ROM image to add to compilation. Drag and drop multiple files onto your shell window. Folders and wildcards are also accepted, or use @listfile to read them from a text file, one per line.",
+		type = str,
 		nargs = '*' # it's possible to build a compilation with only a BIOS ROM
 	)
+	parser.add_argument(
+		'-r',
+		help = "search folders recursively for ROMs",
+		action = 'store_true'
+	)
 	parser.add_argument(
 		'-s',
 		dest = 'splashscreen',
@@ -95,6 +103,13 @@ if __name__ == "__main__":
 		type = argparse.FileType('rb'),
 		default = localpath + default_emubinary
 	)
+	parser.add_argument(
+		'-db',
+		dest = 'database',
+		help = "database file in the PocketNES Menu Maker format (CRC32|title|flags|follow) which stores the region, SMS2, GG-as-SMS and sprite follow settings by CRC32, in place of guessing them from the filename, defaults to " + localpath + default_database,
+		type = str,
+		default = localpath + default_database
+	)
 	parser.add_argument(
 		'-m',
 		help = "mark small ROMs suitable for link transfer",
@@ -105,15 +120,26 @@ if __name__ == "__main__":
 		help = "clean brackets from ROM titles",
 		action = 'store_true'
 	)
+	parser.add_argument(
+		'-dat',
+		help = "Logiqx XML DAT file (e.g. from No-Intro) to title the ROMs by their CRC32 instead of their filenames. Can be given more than once, the first file taking precedence",
+		type = str,
+		action = 'append'
+	)
 
 	# don't use FileType('wb') here because it writes a zero-byte file even if it doesn't parse the arguments correctly
 	parser.add_argument(
 		'-o',
 		dest = 'outputfile',
-		help = "compilation output filename, defaults to " + default_outputfile,
+		help = "compilation output filename, defaults to " + default_outputfile + ", or - to send it to stdout",
 		type = str,
 		default = default_outputfile
 	)
+	parser.add_argument(
+		'-tar',
+		help = "send the compilation and its .pat/.sav files to stdout as a tar archive, instead of writing them as files",
+		action = 'store_true'
+	)
 	parser.add_argument(
 		'-sav',
 		help = "for EZ-Flash IV firmware 1.x - create a blank 64KB .sav file for the compilation, store in the SAVER folder, not needed for firmware 2.x which creates its own blank saves",
@@ -124,121 +150,159 @@ if __name__ == "__main__":
 		help = "for EZ-Flash IV firmware 2.x - create a .pat file for the compilation to force 64KB SRAM saves, store in the PATCH folder",
 		action = 'store_true'
 	)
-	args = parser.parse_args()
-
+	return parser
+
+def build(args, stream=None, titles=None, database=None, emubinary=None):
+
+	emu = preloaded(args.emubinary, emubinary)
+
+	if database is None and os.path.exists(args.database):
+		database = loaddb(args.database)
+
+	if titles is None and args.dat:
+		titles = loadtitles(args.dat)
+
+	with CompilationWriter(args.outputfile, stream=stream) as compilation:
+
+		compilation.copyfrom(emu)
+
+		if args.splashscreen:
+			compilation.copyfrom(args.splashscreen)
+
+		if args.bios:
+			for item in args.bios:
+				biosflag = 1
+				flags = 0
+				follow = 0 # sprite or address follow for 'Unscaled (Auto)' display mode
+				biossize = filesize(item)
+				biospad = (4 - (biossize%4))%4
+				biosfilename = os.path.split(item.name)[1]
+				biosname = os.path.splitext(biosfilename)[0]
+				biostype = os.path.splitext(biosfilename)[1]
+				if "(J)" in biosname or "(Japan)" in biosname or "(JP)" in biosname:
+					flags = set_bit (flags, 1)
+				if biostype.lower() == ".gg" or ".gg.bin" in biosfilename.lower(): # using .bin for BIOS roms stops them being added in batch jobs
+					flags = set_bit (flags, 2) # GG roms need this flag
+				biosheader = struct.pack(header_struct_format, EMU_ID, biossize + biospad, flags, follow, biosflag, 0, 0, 0, biosfilename[:31].encode('ascii'))
+				compilation.write(biosheader)
+				compilation.copyfrom(item)
+				compilation.pad(biospad)
+
+			if args.bb:
+				biosflag = 0
+				flags = 0
+				follow = 0 # sprite or address follow for 'Unscaled (Auto)' display mode
+				empty = b"\xff" * 16384
+				emptyname = "-- Empty --"
+				emptyheader = struct.pack(header_struct_format, EMU_ID, len(empty), flags, follow, biosflag, 0, 0, 0, emptyname.encode('ascii'))
+				compilation.write(emptyheader + empty)
+
+		for item in prefetch(args.romfile):
 
-	compilation = args.emubinary.read()
+			biosflag = 0
+			flags = 0
+			follow = 0 # sprite or address follow for Unscaled (Auto) display mode
 
-	if args.splashscreen:
-		compilation += args.splashscreen.read()
+			romfilename = os.path.split(item.name)[1]
+			romtype = os.path.splitext(romfilename)[1]
+			romtitle = os.path.splitext(romfilename)[0]
+			crc = crc32file(item) if titles is not None or database is not None else None
+			if titles is not None:
+				romtitle = titles.get(crc, romtitle) # the DAT's title, where it has this ROM
 
-	if args.bios:
-		for item in args.bios:
-			biosflag = 1
-			flags = 0
-			follow = 0 # sprite or address follow for 'Unscaled (Auto)' display mode
-			bios = item.read()
-			bios += b"\0" * ((4 - (len(bios)%4))%4)
-			biosfilename = os.path.split(item.name)[1]
-			biosname = os.path.splitext(biosfilename)[0]
-			biostype = os.path.splitext(biosfilename)[1]
-			if "(J)" in biosname or "(Japan)" in biosname or "(JP)" in biosname:
-				flags = set_bit (flags, 1)
-			if biostype.lower() == ".gg" or ".gg.bin" in biosfilename.lower(): # using .bin for BIOS roms stops them being added in batch jobs
+			# Game Gear
+			if romtype.lower() == ".gg":
 				flags = set_bit (flags, 2) # GG roms need this flag
-			biosheader = struct.pack(header_struct_format, EMU_ID, len(bios), flags, follow, biosflag, 0, 0, 0, biosfilename[:31].encode('ascii'))
-			compilation += biosheader + bios
+				if "castle of illusion" in romtitle.lower():
+					flags = clear_bit (flags, 2) # with one exception - this GG game is technically an SMS rom
+				# set JP region for JP-only titles
+				# e.g. to convert Power Strike II to GG Aleste II, rename the rom to "GG Aleste II (J).gg", build, and you will get the JP title screen
+				if "(J)" in romtitle or "(Japan)" in romtitle or "(JP)" in romtitle:
+					flags = set_bit (flags, 1)
+
+			# Master System
+			elif romtype.lower() == ".sms":
+				if "(E)" in romtitle or "(Europe)" in romtitle or "(EUR)" in romtitle:
+					flags = set_bit (flags, 0) # set PAL timing for EUR-only titles
+				if "(J)" in romtitle or "(Japan)" in romtitle or "(JP)" in romtitle:
+					flags = set_bit (flags, 1) # set JP region for JP-only titles
+				# Some Master System titles make use of the enhanced SMSv2 VDP https://www.smspower.org/forums/16872-SMS1VsSMS2
+				if "cosmic spacehead" in romtitle.lower():
+					flags = set_bit (flags, 3)
+				if "excellent dizzy collection" in romtitle.lower():
+					flags = set_bit (flags, 3)
+				if "fantastic dizzy" in romtitle.lower():
+					flags = set_bit (flags, 3)
+				if "micro machines" in romtitle.lower():
+					flags = set_bit (flags, 3)
+				# Some titles also use double height sprites, which are buggy on SMSv1 https://nicole.express/2021/i-am-the-mark-iii.html
+				if "earthworm jim" in romtitle.lower():
+					flags = set_bit (flags, 3)
+
+			# SG-1000
+			elif romtype.lower() == ".sg":
+				# no special cases
+				flags = 0
 
-		if args.bb:
-			biosflag = 0
-			flags = 0
-			follow = 0 # sprite or address follow for 'Unscaled (Auto)' display mode
-			empty = b"\xff" * 16384
-			emptyname = "-- Empty --"
-			emptyheader = struct.pack(header_struct_format, EMU_ID, len(empty), flags, follow, biosflag, 0, 0, 0, emptyname.encode('ascii'))
-			compilation += emptyheader + empty
-
-	for item in args.romfile:
-
-		biosflag = 0
-		flags = 0
-		follow = 0 # sprite or address follow for Unscaled (Auto) display mode
-
-		romfilename = os.path.split(item.name)[1]
-		romtype = os.path.splitext(romfilename)[1]
-		romtitle = os.path.splitext(romfilename)[0]
-
-		# Game Gear
-		if romtype.lower() == ".gg":
-			flags = set_bit (flags, 2) # GG roms need this flag
-			if "castle of illusion" in romtitle.lower():
-				flags = clear_bit (flags, 2) # with one exception - this GG game is technically an SMS rom
-			# set JP region for JP-only titles
-			# e.g. to convert Power Strike II to GG Aleste II, rename the rom to "GG Aleste II (J).gg", build, and you will get the JP title screen
-			if "(J)" in romtitle or "(Japan)" in romtitle or "(JP)" in romtitle:
-				flags = set_bit (flags, 1)
-
-		# Master System
-		elif romtype.lower() == ".sms":
-			if "(E)" in romtitle or "(Europe)" in romtitle or "(EUR)" in romtitle:
-				flags = set_bit (flags, 0) # set PAL timing for EUR-only titles
-			if "(J)" in romtitle or "(Japan)" in romtitle or "(JP)" in romtitle:
-				flags = set_bit (flags, 1) # set JP region for JP-only titles
-			# Some Master System titles make use of the enhanced SMSv2 VDP https://www.smspower.org/forums/16872-SMS1VsSMS2
-			if "cosmic spacehead" in romtype.lower():
-				flags = set_bit (flags, 3)
-			if "excellent dizzy collection" in romtype.lower():
-				flags = set_bit (flags, 3)
-			if "fantastic dizzy" in romtype.lower():
-				flags = set_bit (flags, 3)
-			if "micro machines" in romtype.lower():
-				flags = set_bit (flags, 3)
-			# Some titles also use double height sprites, which are buggy on SMSv1 https://nicole.express/2021/i-am-the-mark-iii.html
-			if "earthworm jim" in romtype.lower():
-				flags = set_bit (flags, 3)
-
-		# SG-1000
-		elif romtype.lower() == ".sg":
-			# no special cases
-			flags = 0
+			else:
+				raise Exception(f'unsupported filetype for compilation - {romfilename}')
 
-		else:
-			raise Exception(f'unsupported filetype for compilation - {romfilename}')
+			if database is not None and crc in database:
+				title, flags, follow = database[crc] # the database's settings replace those guessed from the filename
 
-		if args.c:
-			romtitle = romtitle.split(" [")[0] # strip the square bracket parts of the name
-			romtitle = romtitle.split(" (")[0] # strip the bracket parts of the name
+			if args.c:
+				romtitle = romtitle.split(" [")[0] # strip the square bracket parts of the name
+				romtitle = romtitle.split(" (")[0] # strip the bracket parts of the name
 
-		if args.m:
-			if os.path.getsize(item.name) <= 196608:
-				romtitle = "* " + romtitle[:29]
+			romsize = filesize(item)
+			if args.m:
+				if romsize <= 196608:
+					romtitle = "* " + romtitle[:29]
+				else:
+					romtitle = "  " + romtitle[:29]
 			else:
-				romtitle = "  " + romtitle[:29]
-		else:
-			romtitle = romtitle[:31]
+				romtitle = romtitle[:31]
 
+			rompad = (4 - (romsize%4))%4
+			romheader = struct.pack(header_struct_format, EMU_ID, romsize + rompad, flags, follow, biosflag, 0, 0, 0, romtitle.encode('ascii'))
+			compilation.write(romheader)
+			compilation.copyfrom(item)
+			compilation.pad(rompad)
+			compilation.checkpoint()
 
-		rom = item.read()
-		rom += b"\0" * ((4 - (len(rom)%4))%4)
-		romheader = struct.pack(header_struct_format, EMU_ID, len(rom), flags, follow, biosflag, 0, 0, 0, romtitle.encode('ascii'))
-		compilation += romheader + rom
+			print('{:<32}{}'.format(romtitle,romtype.strip(".")))
 
-		print('{:<32}{}'.format(romtitle,romtype.strip(".")))
-
-	if args.bios or args.romfile:
-		writefile(args.outputfile, compilation)
-	else:
-		parser.print_usage()
+	if args.outputfile == default_outputfile:
+		print("...wrote", args.outputfile)
 
 	if args.pat:
 		# EZ-Flash IV fw2.x GSS patcher metadata to force 64KB SRAM saves - for PATCH folder on SD card
 		patchname = os.path.splitext(args.outputfile)[0] + ".pat"
 		patchdata = b'QlpoOTFBWSZTWRbvmZEAAAT44fyAgIAAEUAAAACIAAQAAAQESaAAVEIaaGRoxBKeqQD1GTJoks40324rSIskHSFhIywXzTCaqwSzf4exCBTgBk/i7kinChIC3fMyIA=='
-		writefile(patchname, bz2.decompress(base64.b64decode(patchdata)))
+		writefile(patchname, bz2.decompress(base64.b64decode(patchdata)), stream)
 
 	if args.sav:
 		# EZ-Flash IV fw1.x blank save - for SAVER folder on SD card
 		savename = os.path.splitext(args.outputfile)[0] + ".sav"
 		saveempty = b"\xff" * SRAM_SAVE
-		if not os.path.exists(savename): # careful not to overwrite an existing save
-			writefile(savename, saveempty)
+		if stream or not os.path.exists(savename): # careful not to overwrite an existing save
+			writefile(savename, saveempty, stream)
+
+
+if __name__ == "__main__":
+
+	if os.path.dirname(argv[0]) and os.path.dirname(argv[0]) != ".":
+		localpath = os.path.dirname(argv[0]) + os.path.sep
+	else:
+		localpath = ""
+
+	parser = buildparser(localpath)
+	args = parser.parse_args()
+	args.romfile = findroms(args.romfile, rom_extensions, args.r)
+	stream = openstream(args, default_outputfile)
+	if not args.bios and not args.romfile:
+		parser.print_usage()
+	else:
+		build(args, stream)
+	if stream:
+		stream.close()
@@ -0,0 +1,139 @@
+#!/usr/bin/python3
+
+import os.path, argparse, zlib
+from sys import argv
+from romio import findroms, filesize, readrange
+from superdat import SuperDat
+from snesrom import analyze, idleloops
+
+SNES_HEADER = 512
+
+default_database = "snesadvance.dat"
+default_maxhacks = 16
+rom_extensions = (".sfc", ".smc") # accepted when searching folders and wildcards
+loop_ranks = {"register": 0, "RAM": 1, "self": 2} # the hacks proposed first, when there are more than -max
+
+# speed hack discovery
+#
+# scans SNES ROMs for idle loops (see snesrom.idleloops) and writes SuperDAT records proposing a WDM speed hack for
+# each, for games which the SuperDAT doesn't have speed hacks for. The records are written to their own DAT, which can
+# be given first with -db when building with snesadvance_compile.py so that it takes precedence. A game which is
+# already in the SuperDAT keeps its title, flags and other patches, so its proposed record can stand in for the old one
+#
+# these are guesses - a loop which only looks idle, or data which decodes as one, will hang or break a game when
+# hacked - so the records need trying in the emulator before they're shared
+
+def buildparser(localpath=""):
+
+	parser = argparse.ArgumentParser(
+		fromfile_prefix_chars = '@',
+		description="This script will scan SNES ROMs for idle loops and propose SNESAdvance speed hacks for them as SuperDAT records, for the games which the SuperDAT doesn't already have speed hacks for.",
+		epilog="coded by patters in 2022"
+	)
+
+	parser.add_argument(
+		dest = 'romfile',
+		help = ".sfc/.smc ROM image to scan. Drag and drop multiple files onto your shell window. Folders and wildcards are also accepted, or use @listfile to read them from a text file, one per line.",
+		type = str,
+		nargs = '+'
+	)
+	parser.add_argument(
+		'-r',
+		help = "search folders recursively for ROMs",
+		action = 'store_true'
+	)
+	parser.add_argument(
+		'-db',
+		dest = 'database',
+		help = "SuperDAT database file whose games already have speed hacks, defaults to " + localpath + default_database + ". Can be given more than once (e.g. for snesadvance2.dat), the first file taking precedence",
+		type = str,
+		action = 'append'
+	)
+	parser.add_argument(
+		'-o',
+		dest = 'outputfile',
+		help = "SuperDAT file to add the proposed records to, defaults to printing them",
+		type = str
+	)
+	parser.add_argument(
+		'-all',
+		help = "propose speed hacks for games which already have them too",
+		action = 'store_true'
+	)
+	parser.add_argument(
+		'-max',
+		dest = 'maxhacks',
+		help = "the most speed hacks to propose for a game, defaults to " + str(default_maxhacks),
+		type = int,
+		default = default_maxhacks
+	)
+	parser.add_argument(
+		'-v',
+		help = "verbose, list the idle loops found",
+		action = 'store_true'
+	)
+	parser.set_defaults(localpath = localpath)
+	return parser
+
+def speedhacked(record):
+	return len(record) > 8 and "=42" in record[8]
+
+def scan(args, database=None):
+	# the proposed SuperDAT records, one line for each ROM with idle loops
+	if database is None:
+		database = SuperDat(args.database or [args.localpath + default_database])
+	lines = []
+	for item in args.romfile:
+		romfilename = os.path.split(item.name)[1]
+		romsize = filesize(item)
+		romdataoffset = SNES_HEADER if romsize%1024 == SNES_HEADER else 0
+		romdata = readrange(item, romdataoffset, romsize - romdataoffset)
+		crc = zlib.crc32(romdata)
+
+		records = database.lookup(crc)
+		if records and speedhacked(records[0]) and not args.all:
+			print("Skipped:", romfilename, "(already has speed hacks)")
+			continue
+
+		loops = sorted(idleloops(romdata), key=lambda loop: (loop_ranks[loop[2]], loop[0]))[:args.maxhacks]
+		print(romfilename, "-", len(loops), "idle loops")
+		if args.v:
+			for address, patch, kind in loops:
+				print("  %X: %s %s, %s" % (address, romdata[address:address + 2].hex().upper(), "loop" if kind == "self" else "loop polling " + kind, patch.hex().upper()))
+		if not loops:
+			continue
+
+		hacks = ",".join("%X=%s" % (address, patch.hex().upper()) for address, patch, kind in sorted(loops))
+		if records:
+			# the game's own record, with its speed hacks replaced
+			fields = (records[0][:8] + ["0"] * 8)[:8] + [records[0][8] if len(records[0]) > 8 else ""]
+			patches = [patch for patch in fields[8].split(",") if patch and "=42" not in patch]
+			fields[8] = ",".join(patches + [hacks])
+		else:
+			flags1 = 0
+			header = analyze(romdata)
+			if header is not None:
+				flags1 = (1 if header.hirom() else 0) | (2 if header.pal() else 0) | (4 if header.sramsize else 0)
+			fields = ["%08X" % crc, os.path.splitext(romfilename)[0], "%X" % flags1, "0", "0", "0", "0", "0", hacks]
+		lines.append("|".join(fields))
+	return lines
+
+
+if __name__ == "__main__":
+
+	if os.path.dirname(argv[0]) and os.path.dirname(argv[0]) != ".":
+		localpath = os.path.dirname(argv[0]) + os.path.sep
+	else:
+		localpath = ""
+
+	args = buildparser(localpath).parse_args()
+	args.romfile = findroms(args.romfile, rom_extensions, args.r)
+	lines = scan(args)
+	if args.outputfile:
+		# SuperDATs have DOS line endings
+		with open(args.outputfile, "a", encoding="latin-1", errors="replace", newline="\r\n") as fh:
+			for line in lines:
+				fh.write(line + "\n")
+	else:
+		for line in lines:
+			print(line)
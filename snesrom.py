@@ -0,0 +1,201 @@
+#!/usr/bin/python3
+
+import zlib, re
+
+# SNES internal ROM headers, for the SNES builders to tell LoROM from HiROM and to read the SRAM size and region
+#
+# https://sneslab.net/wiki/SNES_ROM_Header
+# https://snes.nesdev.org/wiki/ROM_header
+#
+# the header sits at the end of the first bank - 0x7FC0 for LoROM, 0xFFC0 for HiROM and 0x40FFC0 for ExHiROM, in a ROM
+# without a copier header. Each location is scored on the checksum, the map mode, the reset vector and the title, and
+# the best one is taken, since a checksum alone is wrong for many hacks, translations and prototypes
+
+header_locations = (("LoROM", 0x7FC0), ("HiROM", 0xFFC0), ("ExHiROM", 0x40FFC0))
+# the map modes expected at each location, with the FastROM bit (0x10) cleared
+header_mapmodes = {"LoROM": (0x20, 0x22, 0x23), "HiROM": (0x21, 0x2A), "ExHiROM": (0x25,)}
+# first instructions often found at the reset vector - sei, clc, sec, xce, rep, sep, stz, jmp, jml, jsr, jsl, lda/ldx #
+reset_opcodes = (0x78, 0x18, 0x38, 0xFB, 0xC2, 0xE2, 0x9C, 0x4C, 0x5C, 0x20, 0x22, 0xA9, 0xA2)
+pal_countries = set(range(0x02, 0x0D)) | {0x11} # Europe and its countries, China, Indonesia, Australia
+
+def bytesum(data, start=0, end=None):
+	# the sum of the bytes, at C speed. Adler-32 keeps the sum of its input modulo 65521 (plus one) in its low half,
+	# which is the exact sum for up to 256 bytes of 0xFF - so the bytes are summed 256 at a time
+	view = memoryview(data)[start:end]
+	total = 0
+	for position in range(0, len(view), 256):
+		total += (zlib.adler32(view[position:position + 256]) & 0xFFFF) - 1
+	return total
+
+def mirrorsum(rom, start, length, mask=0x80000000):
+	# the sum of a ROM which isn't a power of two in size, whose last part is mirrored to fill the next power of two -
+	# as the SNES's own mapping does, and as the header checksum is calculated (following snes9x and NSRT). Returned with
+	# the length it fills once mirrored, which a part with its own remainder has widened to the next power of two
+	while mask and not length & mask:
+		mask >>= 1
+	total = bytesum(rom, start, start + mask)
+	remainder = length - mask
+	if remainder:
+		mirrored, remainder = mirrorsum(rom, start + mask, remainder, mask >> 1)
+		while remainder < mask:
+			remainder += remainder
+			mirrored += mirrored
+		total += mirrored
+		length = mask + mask
+	return total, length
+
+def checksum(rom):
+	# the 16-bit internal checksum of a ROM without a copier header
+	return mirrorsum(rom, 0, len(rom))[0] & 0xFFFF if rom else 0
+
+class SnesHeader:
+
+	# the internal header at one of the header locations, scored on how likely it is to be the real one
+
+	def __init__(self, rom, maptype, offset, romchecksum):
+		header = rom[offset:offset + 0x40]
+		self.maptype = maptype
+		self.offset = offset
+		self.title = bytes(header[0x00:0x15])
+		self.mapmode = header[0x15]
+		self.romsize = header[0x17] # as log2 of the size in KB
+		self.sramsize = header[0x18] # as log2 of the size in KB, or 0 for none
+		self.country = header[0x19]
+		self.complement = int.from_bytes(header[0x1C:0x1E], byteorder='little')
+		self.checksum = int.from_bytes(header[0x1E:0x20], byteorder='little')
+		self.reset = int.from_bytes(header[0x3C:0x3E], byteorder='little')
+		self.valid = self.checksum == romchecksum and self.checksum ^ self.complement == 0xFFFF
+
+		score = 0
+		if self.valid:
+			score += 4
+		if self.checksum ^ self.complement == 0xFFFF:
+			score += 2
+		if self.mapmode & ~0x10 in header_mapmodes[maptype]:
+			score += 2
+		elif not 0x20 <= self.mapmode <= 0x3F:
+			score -= 1
+		if self.reset >= 0x8000:
+			score += 2
+			# the reset vector is in bank 0, which is mapped to the 32KB before the header's bank ends
+			resetoffset = offset + 0x40 - 0x10000 + self.reset
+			if 0 <= resetoffset < len(rom) and rom[resetoffset] in reset_opcodes:
+				score += 1
+		else:
+			score -= 4 # the 65816 can't start outside of ROM
+		if all(0x20 <= value <= 0x7E or 0xA0 <= value <= 0xDF for value in self.title): # ASCII or JIS X 0201 kana
+			score += 1
+		if 0x07 <= self.romsize <= 0x0D and self.sramsize <= 0x08:
+			score += 1
+		self.score = score
+
+	def hirom(self):
+		return self.maptype != "LoROM"
+
+	def pal(self):
+		return self.country in pal_countries
+
+	def sramsizebytes(self):
+		return 0x400 << self.sramsize if self.sramsize else 0
+
+def analyze(rom):
+	# the most likely internal header of a ROM without a copier header, or None if it's too small to have one. Where
+	# the scores are even LoROM is preferred, then HiROM
+	romchecksum = checksum(rom)
+	best = None
+	for maptype, offset in header_locations:
+		if len(rom) >= offset + 0x40:
+			candidate = SnesHeader(rom, maptype, offset, romchecksum)
+			if best is None or candidate.score > best.score:
+				best = candidate
+	return best
+
+# idle loops, for SNESAdvance speed hacks
+#
+# a game waiting for the next frame spins in a short loop which only reads - polling $4210/$4212 or a flag in RAM that
+# its NMI handler sets - until an interrupt changes what it reads. SNESAdvance skips ahead to the next interrupt when it
+# meets a WDM (0x42) in place of such a loop's branch. The byte after the WDM holds the branch opcode in its high nibble
+# and the low nibble of the branch offset in its low nibble, so loops of up to 16 bytes can be hacked, e.g. 421B for a
+# BPL -5 (as in the SuperDAT, where the patches are written ADDRESS=42XX)
+
+branch_opcodes = (0x10, 0x30, 0x50, 0x70, 0x90, 0xB0, 0xD0, 0xF0, 0x80) # BPL BMI BVC BVS BCC BCS BNE BEQ BRA
+# every short backward branch (offsets -16 to -2) - the lookahead finds overlapping ones too, at C speed
+branch_search = re.compile(b"(?=[" + b"".join(re.escape(bytes([opcode])) for opcode in branch_opcodes) + b"][\xF0-\xFE])", re.DOTALL)
+# the instructions which may make up an idle loop, as they only read, by their length - LDA LDX LDY BIT AND ORA EOR CMP
+# CPX CPY in their direct page (2), absolute (3) and long (4) addressing modes, and some which only touch registers (1)
+loop_reads = {
+	0xA5: 2, 0xAD: 3, 0xAF: 4, 0xB5: 2, 0xBD: 3, 0xB9: 3, 0xBF: 4, 0xB2: 2, 0xA7: 2, 0xB1: 2, 0xB7: 2, 0xA3: 2, 0xB3: 2, 0xA1: 2,
+	0xA6: 2, 0xAE: 3, 0xB6: 2, 0xBE: 3,
+	0xA4: 2, 0xAC: 3, 0xB4: 2, 0xBC: 3,
+	0x24: 2, 0x2C: 3, 0x34: 2, 0x3C: 3,
+	0x25: 2, 0x2D: 3, 0x2F: 4, 0x35: 2, 0x3D: 3, 0x39: 3, 0x3F: 4, 0x32: 2, 0x27: 2, 0x31: 2, 0x37: 2,
+	0x05: 2, 0x0D: 3, 0x0F: 4, 0x15: 2, 0x1D: 3, 0x19: 3, 0x1F: 4,
+	0x45: 2, 0x4D: 3, 0x4F: 4, 0x55: 2, 0x5D: 3, 0x59: 3, 0x5F: 4,
+	0xC5: 2, 0xCD: 3, 0xCF: 4, 0xD5: 2, 0xDD: 3, 0xD9: 3, 0xDF: 4, 0xD2: 2, 0xC7: 2, 0xD1: 2, 0xD7: 2,
+	0xE4: 2, 0xEC: 3, 0xC4: 2, 0xCC: 3,
+}
+loop_registers = (0x0A, 0x2A, 0x4A, 0x6A, 0xEA, 0xAA, 0xA8, 0x8A, 0x98, 0x18, 0x38) # ASL ROL LSR ROR NOP TAX TAY TXA TYA CLC SEC
+loop_immediates_m = (0xA9, 0x29, 0x89, 0xC9, 0x09, 0x49) # 2 or 3 bytes, with the accumulator's width
+loop_immediates_x = (0xA2, 0xA0, 0xE0, 0xC0) # 2 or 3 bytes, with the index registers' width
+
+def pollable(address):
+	# an absolute address worth waiting on - RAM, the PPU and CPU registers, or the joypads
+	return address < 0x2000 or 0x2100 <= address < 0x2200 or 0x4016 <= address < 0x4018 or 0x4200 <= address < 0x4220
+
+def looptype(body, widths):
+	# "register" or "RAM" for a loop body which only reads, decoded with the accumulator and index widths given, or
+	# None if it doesn't decode exactly into such instructions
+	kind = None
+	position = 0
+	while position < len(body):
+		opcode = body[position]
+		if opcode in loop_reads:
+			length = loop_reads[opcode]
+			if length == 3:
+				address = int.from_bytes(body[position + 1:position + 3], byteorder='little')
+				if not pollable(address):
+					return None
+				if 0x2100 <= address < 0x4400:
+					kind = "register"
+			elif length == 4 and not (body[position + 3:position + 4] in (b"\x7E", b"\x7F") or (body[position + 3:position + 4] in (b"\x00", b"\x80") and pollable(int.from_bytes(body[position + 1:position + 3], byteorder='little')))):
+				return None
+			kind = kind or "RAM"
+		elif opcode in loop_registers:
+			length = 1
+		elif opcode in loop_immediates_m:
+			length = 1 + widths[0]
+		elif opcode in loop_immediates_x:
+			length = 1 + widths[1]
+		else:
+			return None
+		position += length
+	if position != len(body):
+		return None
+	return kind
+
+def idleloops(rom):
+	# the idle loops in a ROM without a copier header, as (address, patch, kind) - where the patch is the two bytes to
+	# put in place of the loop's branch, and kind is "register" (polling the PPU or CPU), "RAM" (polling a flag) or
+	# "self" (a branch to itself). Loops overlapping the header locations are left out, as those bytes aren't code
+	loops = []
+	end = -1
+	for found in branch_search.finditer(rom):
+		address = found.start()
+		if address < end:
+			continue # overlaps the branch of the loop before
+		if any(location - 0x10 <= address < location + 0x40 for maptype, location in header_locations):
+			continue
+		opcode = rom[address]
+		offset = rom[address + 1] - 0x100
+		start = address + 2 + offset
+		if start < 0:
+			continue
+		if offset == -2:
+			kind = "self" if opcode == 0x80 else None # a conditional branch to itself isn't waiting on anything
+		else:
+			body = rom[start:address]
+			kind = looptype(body, (1, 1)) or looptype(body, (2, 1)) or looptype(body, (1, 2)) or looptype(body, (2, 2))
+		if kind:
+			loops.append((address, bytes((0x42, (opcode & 0xF0) | (offset & 0x0F))), kind))
+			end = address + 2
+	return loops
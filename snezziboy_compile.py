@@ -1,91 +1,172 @@
 #!/usr/bin/python3
 
-import sys, os.path, struct, argparse, bz2, base64, zlib
+import sys, os.path, struct, argparse, bz2, base64, zlib, io, contextlib, itertools, functools, hashlib
 from sys import argv
+from romio import findroms, CompilationWriter, filesize, readrange, prefetch, writeatomic, openstream, hashfile, CACHE_HOME
+from superdat import SuperDat, compilepatches, ipspatch
+from snesrom import analyze
 
 SNES_HEADER = 512
 SRAM_SAVE = 65536
 
 default_emubinary = "snezzi.gba"
 default_database = "snezzi.dat"
+rom_extensions = (".sfc", ".smc") # accepted when searching folders and wildcards
 
 anchor = b"SMEMMAP0"
 iwramstart = b".IWRAMSTART"
 iwramend = b".IWRAMEND"
+workerstate = None # the emulator and databases, in a -j worker process
+build_stamps = os.path.join(CACHE_HOME, "snezziboy") # what each output was built from, for -resume
+recipe_options = ("c", "sav", "pat", "ips", "outputfile") # the options which change what is written for a game
 
-def NOP(v):
+# each region type maps a SNES address to a GBA address, for a ROM of romSize bytes placed at snesRomPosition in the GBA ROM
+
+def NOP(v, romSize, snesRomPosition):
 	return 0x00000000
 
-def LRAM(v):
+def LRAM(v, romSize, snesRomPosition):
 	return (v & 0x0000FFFF) | 0x02000000
 
-def HRAM(v):
+def HRAM(v, romSize, snesRomPosition):
 	return (v & 0x0000FFFF) | 0x02010000
 
-def LROM(v):
+def LROM(v, romSize, snesRomPosition):
 	return ((v & 0x00007FFF) + ((v >> 1) & ((romSize - 1) & ~0x7FFF))) + 0x08000000 + snesRomPosition
 
-def HROM(v):
+def HROM(v, romSize, snesRomPosition):
 	return ((v & 0x0000FFFF) + (v & ((romSize - 1) & ~0xFFFF))) + 0x08000000 + snesRomPosition
 
-def ROM(v):
+def ROM(v, romSize, snesRomPosition):
 	return(v & 0x000FFFFF) + 0x08000000 + snesRomPosition
 
-def IO(v):
+def IO(v, romSize, snesRomPosition):
 	return (v & 0x0000FFFF) | 0x80000000
 
-def SRAM(v):
+def SRAM(v, romSize, snesRomPosition):
 	return (v & 0x00001FFF) + 0x80006000
 
-def SVEC(v):
+def SVEC(v, romSize, snesRomPosition):
 	return (v & 0x000000FF) + 0x0203FF00
 
-def _set(x,v):
-	global memorymap
-	result = (v(x * 0x2000) - (x * 0x2000)) & 0xFFFFFFFF
-	memorymap += struct.pack("<I", int(result))
-
-def _map(s,e,m0,m1,m2,m3,m4,m5,m6,m7):
-	for i in range(s,e+1):
-		x = i*8
-		_set(x+0, m0)
-		_set(x+1, m1)
-		_set(x+2, m2)
-		_set(x+3, m3)
-		_set(x+4, m4)
-		_set(x+5, m5)
-		_set(x+6, m6)
-		_set(x+7, m7)
-
-def formmemorymap(loRom, romSize):
-	global memorymap
+def _map(s, e, regions, romSize, snesRomPosition):
+	# the offsets for banks s to e, each bank being 8 regions of 8KB
+	return [(regions[x & 7](x * 0x2000, romSize, snesRomPosition) - x * 0x2000) & 0xFFFFFFFF for x in range(s * 8, e * 8 + 8)]
+
+# the same few maps serve every ROM of a size, so they are only formed once
+@functools.lru_cache(maxsize=64)
+def formmemorymap(loRom, romSize, sramSizeBytes, snesRomPosition):
 	if loRom:
 		# LoROM
-		_map(0x00, 0x2f, LRAM,IO,  IO,  NOP, LROM,LROM,LROM,LROM)
-		_map(0x30, 0x3f, LRAM,IO,  IO,  SRAM,LROM,LROM,LROM,LROM)
-		_map(0x40, 0x6f, NOP, NOP, NOP, NOP, LROM,LROM,LROM,LROM)
-		_map(0x70, 0x7d, SRAM,SRAM,SRAM,SRAM,LROM,LROM,LROM,LROM)
-		_map(0x7e, 0x7e, LRAM,LRAM,LRAM,LRAM,LRAM,LRAM,LRAM,LRAM)
-		_map(0x7f, 0x7f, HRAM,HRAM,HRAM,HRAM,HRAM,HRAM,HRAM,HRAM)
-
-		_map(0x80, 0xaf, LRAM,IO,  IO,  NOP, LROM,LROM,LROM,LROM)
-		_map(0xb0, 0xbf, LRAM,IO,  IO,  SRAM,LROM,LROM,LROM,LROM)
-		_map(0xc0, 0xff, LROM,LROM,LROM,LROM,LROM,LROM,LROM,LROM)
+		layout = (
+			(0x00, 0x2f, (LRAM,IO,  IO,  NOP, LROM,LROM,LROM,LROM)),
+			(0x30, 0x3f, (LRAM,IO,  IO,  SRAM,LROM,LROM,LROM,LROM)),
+			(0x40, 0x6f, (NOP, NOP, NOP, NOP, LROM,LROM,LROM,LROM)),
+			(0x70, 0x7d, (SRAM,SRAM,SRAM,SRAM,LROM,LROM,LROM,LROM)),
+			(0x7e, 0x7e, (LRAM,LRAM,LRAM,LRAM,LRAM,LRAM,LRAM,LRAM)),
+			(0x7f, 0x7f, (HRAM,HRAM,HRAM,HRAM,HRAM,HRAM,HRAM,HRAM)),
+
+			(0x80, 0xaf, (LRAM,IO,  IO,  NOP, LROM,LROM,LROM,LROM)),
+			(0xb0, 0xbf, (LRAM,IO,  IO,  SRAM,LROM,LROM,LROM,LROM)),
+			(0xc0, 0xff, (LROM,LROM,LROM,LROM,LROM,LROM,LROM,LROM)),
+		)
 
 	else:
 		# HiROM
-		_map(0x00, 0x2f, LRAM,IO,  IO,  NOP, HROM,HROM,HROM,HROM)
-		_map(0x30, 0x3f, LRAM,IO,  IO,  SRAM,HROM,HROM,HROM,HROM)
-		_map(0x40, 0x6f, HROM,HROM,HROM,HROM,HROM,HROM,HROM,HROM)
-		_map(0x70, 0x7d, SRAM,SRAM,SRAM,SRAM,HROM,HROM,HROM,HROM)
-		_map(0x7e, 0x7e, LRAM,LRAM,LRAM,LRAM,LRAM,LRAM,LRAM,LRAM)
-		_map(0x7f, 0x7f, HRAM,HRAM,HRAM,HRAM,HRAM,HRAM,HRAM,HRAM)
-
-		_map(0x80, 0xaf, LRAM,IO,  IO,  NOP, HROM,HROM,HROM,HROM)
-		_map(0xb0, 0xbf, LRAM,IO,  IO,  SRAM,HROM,HROM,HROM,HROM)
-		_map(0xc0, 0xff, HROM,HROM,HROM,HROM,HROM,HROM,HROM,HROM)
-	
-	memorymap += struct.pack("<2I", sramSizeBytes - 1, 0x8000000 + snesRomPosition)
+		layout = (
+			(0x00, 0x2f, (LRAM,IO,  IO,  NOP, HROM,HROM,HROM,HROM)),
+			(0x30, 0x3f, (LRAM,IO,  IO,  SRAM,HROM,HROM,HROM,HROM)),
+			(0x40, 0x6f, (HROM,HROM,HROM,HROM,HROM,HROM,HROM,HROM)),
+			(0x70, 0x7d, (SRAM,SRAM,SRAM,SRAM,HROM,HROM,HROM,HROM)),
+			(0x7e, 0x7e, (LRAM,LRAM,LRAM,LRAM,LRAM,LRAM,LRAM,LRAM)),
+			(0x7f, 0x7f, (HRAM,HRAM,HRAM,HRAM,HRAM,HRAM,HRAM,HRAM)),
+
+			(0x80, 0xaf, (LRAM,IO,  IO,  NOP, HROM,HROM,HROM,HROM)),
+			(0xb0, 0xbf, (LRAM,IO,  IO,  SRAM,HROM,HROM,HROM,HROM)),
+			(0xc0, 0xff, (HROM,HROM,HROM,HROM,HROM,HROM,HROM,HROM)),
+		)
+
+	offsets = []
+	for s, e, regions in layout:
+		offsets += _map(s, e, regions, romSize, snesRomPosition)
+	offsets += (sramSizeBytes - 1, 0x8000000 + snesRomPosition)
+	return struct.pack("<%dI" % len(offsets), *offsets)
+
+class SnezziCore:
+
+	# The emulator binary, with everything about it that the outputs need found once - see preparecore(). Each output
+	# is written as the core up to the memory map, the ROM's memory map, then the rest of the core, so the core itself
+	# is never copied
+
+	def __init__(self, emubinary):
+		self.binary = memoryview(emubinary)
+		self.digest = hashlib.sha1(emubinary).digest()
+		self.anchorfound = emubinary.find(anchor)
+		self.iwramstartfound = emubinary.find(iwramstart)
+		self.iwramendfound = emubinary.find(iwramend)
+		self.emuSize = int((len(emubinary) + 4096) / 4096) * 4096
+		self.snesRomPosition = int(self.emuSize/65536) * 65536
+		if self.emuSize%65536!=0:
+			self.snesRomPosition += 65536
+
+	def write(self, output, memorymap):
+		mapoffset = self.anchorfound + 8
+		output.write(self.binary[:mapoffset])
+		output.write(memorymap)
+		output.write(self.binary[mapoffset + len(memorymap):])
+		output.pad(self.snesRomPosition - max(len(self.binary), mapoffset + len(memorymap)))
+
+MAX_PREPARED_CORES = 4 # each one holds a whole emulator binary
+prepared_cores = {} # by the SHA-1 of the emulator binary, insertion ordered so the first key is the least recently used
+
+def preparecore(emubinary):
+	key = hashlib.sha1(emubinary).digest()
+	core = prepared_cores.pop(key, None)
+	if core is None:
+		core = SnezziCore(emubinary)
+		if len(prepared_cores) >= MAX_PREPARED_CORES:
+			prepared_cores.pop(next(iter(prepared_cores)))
+	prepared_cores[key] = core # re-inserted as the most recently used
+	return core
+
+@functools.lru_cache(maxsize=16)
+def contentsdigest(files):
+	return hashlib.sha1(b"".join(hashfile(name) for name, size, mtime in files)).digest()
+
+def filesdigest(names):
+	# the SHA-1 of the files' contents, only hashed again when one of them has changed
+	return contentsdigest(tuple((name, os.stat(name).st_size, os.stat(name).st_mtime_ns) for name in names))
+
+def buildrecipe(args, item, core, databases):
+	# everything a game's output is built from - its ROM, the emulator, the databases and the options
+	recipe = hashlib.sha1(repr([getattr(args, option) for option in recipe_options]).encode())
+	recipe.update(core.digest)
+	recipe.update(filesdigest(databases))
+	recipe.update(hashlib.sha1(readrange(item, 0, filesize(item))).digest())
+	return recipe.hexdigest()
+
+def stampname(outputfile):
+	return os.path.join(build_stamps, hashlib.sha1(os.path.abspath(outputfile).encode()).hexdigest())
+
+def stamp(outputfile):
+	# the recipe of the output when it was built, with the size and mtime it was left with - or None
+	try:
+		with open(stampname(outputfile)) as fh:
+			fields = fh.read().split()
+		stat = os.stat(outputfile)
+	except OSError:
+		return None
+	if len(fields) != 3 or fields[1:] != [str(stat.st_size), str(stat.st_mtime_ns)]:
+		return None # the output has been changed or replaced since
+	return fields[0]
+
+def writestamp(outputfile, recipe):
+	stat = os.stat(outputfile)
+	try:
+		os.makedirs(build_stamps, exist_ok=True)
+		writeatomic(stampname(outputfile), f'{recipe} {stat.st_size} {stat.st_mtime_ns}'.encode())
+	except OSError:
+		pass # without a stamp the game is just built again next time
 
 
 def checksum(input):
@@ -99,9 +180,11 @@ def readfile(name):
 		contents = fh.read()
 	return contents
 
-def writefile(name, contents):
-	with open(name, "wb") as fh:
-		fh.write(contents)
+def writefile(name, contents, stream=None):
+	if stream:
+		stream.addfile(name, contents)
+	else:
+		writeatomic(name, contents)
 
 #def get_bit(value, n):
 #    return ((value >> n & 1) != 0)
@@ -113,24 +196,25 @@ def writefile(name, contents):
 #    return value & ~(1 << n)
 
 
-if __name__ == "__main__":
-
-	if os.path.dirname(argv[0]) and os.path.dirname(argv[0]) != ".":
-		localpath = os.path.dirname(argv[0]) + os.path.sep
-	else:
-		localpath = ""
+def buildparser(localpath=""):
 
 	parser = argparse.ArgumentParser(
+		fromfile_prefix_chars = '@',
 		description="This script will assemble the Snezziboy emulator and a single SNES ROM into a Gameboy Advance ROM image. If supplied with multiple ROM files it will create multiple compilations. It is recommended to type the script name, then drag and drop multiple ROM files onto the shell window, then add any additional arguments as needed. A dat file database is required.",
 		epilog="coded by patters in 2022"
 	)
 
 	parser.add_argument(
 		dest = 'romfile',
-		help = ".sfc/.smc ROM image to add to compilation. Drag and drop multiple files onto your shell window.",
-		type = argparse.FileType('rb'),
+		help = ".sfc/.smc ROM image to add to compilation. Drag and drop multiple files onto your shell window. Folders and wildcards are also accepted, or use @listfile to read them from a text file, one per line.",
+		type = str,
 		nargs = '+'
 	)
+	parser.add_argument(
+		'-r',
+		help = "search folders recursively for ROMs",
+		action = 'store_true'
+	)
 	parser.add_argument(
 		'-e', 
 		dest = 'emubinary',
@@ -141,9 +225,9 @@ if __name__ == "__main__":
 	parser.add_argument(
 		'-db', 
 		dest = 'database',
-		help = "Database file which stores speed hacks for many games, defaults to " + localpath + default_database + ". SNESAdvance SuperDAT file is also supported.",
+		help = "Database file which stores speed hacks for many games, defaults to " + localpath + default_database + ". SNESAdvance SuperDAT file is also supported. Can be given more than once, the first file taking precedence.",
 		type = str,
-		default = localpath + default_database
+		action = 'append'
 	)
 	parser.add_argument(
 		'-c',
@@ -160,9 +244,14 @@ if __name__ == "__main__":
 	parser.add_argument(
 		'-o',
 		dest = 'outputfile',
-		help = "defaults to the ROM name with a .gba extension, may be overridden only when a single romfile is provided",
+		help = "defaults to the ROM name with a .gba extension, may be overridden only when a single romfile is provided, or - to send it to stdout",
 		type = str
 	)
+	parser.add_argument(
+		'-tar',
+		help = "send the compilation and its .pat/.sav files to stdout as a tar archive, instead of writing them as files",
+		action = 'store_true'
+	)
 	parser.add_argument(
 		'-sav',
 		help = "for EZ-Flash IV firmware 1.x - create a blank 64KB .sav file for the compilation, store in the SAVER folder, not needed for firmware 2.x which creates its own blank saves",
@@ -178,170 +267,222 @@ if __name__ == "__main__":
 		help = "strip headered ROMs (.smc) and export as headerless (.sfc)",
 		action = 'store_true'
 	)
-	args = parser.parse_args()
+	parser.add_argument(
+		'-ips',
+		help = "export the database patches for each ROM as an .ips file, which applies to the headerless ROM",
+		action = 'store_true'
+	)
+	parser.add_argument(
+		'-resume',
+		help = "skip games already built from the same ROM, emulator, database and options, e.g. to finish a batch which was interrupted",
+		action = 'store_true'
+	)
+	parser.add_argument(
+		'-j',
+		help = "build this many ROMs at once, each in its own process, defaults to 1. A ROM which fails doesn't stop the rest",
+		type = int,
+		default = 1
+	)
+	parser.set_defaults(localpath = localpath) # where the default database is looked for
+	return parser
 
-	emubinary = args.emubinary.read()
+def buildrom(args, item, single, core, database, databases, stream=None):
+	# one ROM, bundled with its own copy of the emulator
+	db_match = "  "
 
-	for item in args.romfile:
+	romfilename = os.path.split(item.name)[1]
+	romtype = os.path.splitext(romfilename)[1]
+	romtitle = os.path.splitext(romfilename)[0]
 
-		db_match = "  "
+	if romtype.lower() == ".sfc" or romtype.lower() == ".smc":
 
-		romfilename = os.path.split(item.name)[1]
-		romtype = os.path.splitext(romfilename)[1]
-		romtitle = os.path.splitext(romfilename)[0]
+		outputtitle = romtitle
+		if args.c:
+			outputtitle = outputtitle.split(" [")[0] # strip the square bracket parts of the name
+			outputtitle = outputtitle.split(" (")[0] # strip the bracket parts of the name
 
-		if romtype.lower() == ".sfc" or romtype.lower() == ".smc":
+		if args.outputfile and single:
+			outputfile = args.outputfile
+		else:
+			outputfile = outputtitle + ".gba"
+
+		# outputs are only renamed into place once complete, so with -resume a batch which was interrupted can simply be
+		# run again - games which were already done are skipped, unless their ROM, the emulator, the databases or the
+		# options have changed since
+		recipe = None
+		if args.resume and not stream:
+			recipe = buildrecipe(args, item, core, databases)
+			done = stamp(outputfile) == recipe
+			if args.pat:
+				done = done and os.path.exists(os.path.splitext(outputfile)[0] + ".pat")
+			if done and not args.strip:
+				print("  ", outputtitle, "(up to date)")
+				return
+
+		spans = [] # database patches, applied as the ROM is copied
+		romSize = filesize(item)
+		if romSize%1024 == SNES_HEADER:
+			# rom header is present, it needs to be removed to checksum only the rom data
+			romdataoffset = SNES_HEADER
+			romSize -= 512
+			if args.v:
+				print("Header      : Yes")
+			if args.strip:
+				if not os.path.exists(romtitle + ".sfc"):
+					writefile(romtitle + ".sfc", readrange(item, SNES_HEADER, romSize))
+		else:
+			romdataoffset = 0
+			if args.v:
+				print("Header      : No")
 
-			rom = item.read()
-			romSize = len(rom)
-			if romSize%1024 == SNES_HEADER:
-				# rom header is present, it needs to be removed to checksum only the rom data
-				romdata = rom[SNES_HEADER:]
-				romSize -= 512
-				if args.v:
-					print("Header      : Yes")
-				if args.strip:
-					if not os.path.exists(romtitle + ".sfc"):
-						writefile(romtitle + ".sfc", romdata)
-			else:
-				romdata = rom
-				if args.v:
-					print("Header      : No")
+		# the whole ROM is needed to check its internal checksum
+		romdata = readrange(item, romdataoffset, romSize)
 
-			crcstr = hex(zlib.crc32(romdata))
-			crcstr = str(crcstr)[2:].upper()
+		crc = zlib.crc32(romdata)
 
-			emulator = bytearray(emubinary)
-			emuSize = len(emulator)
-			emuSize = int((emuSize + 4096) / 4096) * 4096
+		emuSize = core.emuSize
+		anchorfound = core.anchorfound
+		iwramstartfound = core.iwramstartfound
+		iwramendfound = core.iwramendfound
+		snesRomPosition = core.snesRomPosition
 
-			if args.v:
-				print("ROM Size    :", int(romSize*8/(1024*1024)), "megabits")
-				print("CRC Checksum:", crcstr)
-				print("Emu Core    :", int(emuSize/1024), "KB")
-
-			# find all anchor positions
-			anchorfound = emulator.find(anchor)
-			iwramstartfound = emulator.find(iwramstart)
-			iwramendfound = emulator.find(iwramend)
-
-			snesRomPosition = int(emuSize/65536) * 65536
-			if emuSize%65536!=0:
-				snesRomPosition += 65536
-			
-			if args.v:
-				print("SMEMMAP     :", str(hex(anchorfound)) )
-				print("SNES ROM    :", str(hex(snesRomPosition)) )
-
-				if iwramendfound - iwramstartfound <= (32 * 1024 - 512):
-					print( "IWRAM Size  :", iwramendfound - iwramstartfound, "out of", (32*1024-512), "bytes")
-				else:
-					print( "IWRAM size  :", iwramendfound - iwramstartfound, "bytes (Invalid)")
-
-			# check HiRom/LoROM by checking for matching SNES ROM header checksum and checksum complement 16bit values
-			# the header occupies the last 64 bytes of the first page of ROM data ending at 0x7FFF for LoRom / 0xFFFF for HiROM
-			# https://en.m.wikibooks.org/wiki/Super_NES_Programming/SNES_memory_map
-			# https://sneslab.net/wiki/SNES_ROM_Header
-			loROM = 1
-			romCheckSum = struct.unpack("<H", romdata[0xFFDC:0xFFDE])[0]
-			romInvCheckSum = struct.unpack("<H", romdata[0xFFDE:0xFFE0])[0]
-			if (romCheckSum ^ romInvCheckSum) & 0xFFFF == 0xFFFF: # checksum XOR checksum complement
-				loROM = 0
+		if args.v:
+			print("ROM Size    :", int(romSize*8/(1024*1024)), "megabits")
+			print("CRC Checksum:", "%X" % crc)
+			print("Emu Core    :", int(emuSize/1024), "KB")
+
+		if args.v:
+			print("SMEMMAP     :", str(hex(anchorfound)) )
+			print("SNES ROM    :", str(hex(snesRomPosition)) )
+
+			if iwramendfound - iwramstartfound <= (32 * 1024 - 512):
+				print( "IWRAM Size  :", iwramendfound - iwramstartfound, "out of", (32*1024-512), "bytes")
 			else:
-				romCheckSum = struct.unpack("<h", romdata[0x7FDC:0x7FDE])[0]
-				romInvCheckSum = struct.unpack("<h", romdata[0x7FDE:0x7FE0])[0]
-				if (romCheckSum ^ romInvCheckSum) & 0xFFFF == 0xFFFF: # checksum XOR checksum complement
-					loROM = 1
+				print( "IWRAM size  :", iwramendfound - iwramstartfound, "bytes (Invalid)")
 
-			if args.v:
-				if loROM:
-					print("Memory Map  : LoROM")
-				else:
-					print("Memory Map  : HiROM")
+		# tell HiROM from LoROM by the most likely internal header - see snesrom.py. Snezziboy maps ExHiROM as HiROM
+		header = analyze(romdata)
+		loROM = 1 if header is None or not header.hirom() else 0
 
-			# obtain SRAM size from the SNES header
+		if args.v:
 			if loROM:
-				sramSize = romdata[0x7FD8]
+				print("Memory Map  : LoROM")
 			else:
-				sramSize = romdata[0xFFD8]
-			if sramSize:
-				sramSizeBytes = (0x400 << sramSize)
-			else:
-				sramSizeBytes = 1
-
-			if args.c:
-				romtitle = romtitle.split(" [")[0] # strip the square bracket parts of the name
-				romtitle = romtitle.split(" (")[0] # strip the bracket parts of the name
+				print("Memory Map  : HiROM")
 
+		# obtain SRAM size from the SNES header
+		sramSize = header.sramsize if header is not None else 0
+		if sramSize:
+			sramSizeBytes = (0x400 << sramSize)
+		else:
+			sramSizeBytes = 1
+
+		if args.v:
+			print("SRAM Size   :", int(sramSizeBytes/1024), "KB")
+			print("Game        :", outputtitle)
+
+		# do the necessary patching
+		records = database.lookup(crc)
+		if records:
+			db_match = "db"
+		# in either dat type patches are the last field - the first record's take precedence where they conflict
+		patchlists = [recorddata[-1] for recorddata in records if len(recorddata) > 8 or len(recorddata) == 3]
+		if patchlists:
+			spans, conflicts = compilepatches(patchlists)
 			if args.v:
-				print("SRAM Size   :", int(sramSizeBytes/1024), "KB")
-				print("Game        :", romtitle)
-
-			# do the necessary patching
-			with open(args.database, "r", encoding='latin-1') as fh:
-				lines = fh.readlines()
-				for record in lines:
-					# SNESAdvance SuperDAT
-					# CRC32|title|flags1|flags2|autoscroll1|autoscroll2|scale|offset|patches
-
-					# snezziboy.dat
-					# CRC32|title|patches
-
-					if crcstr in record:
-						db_match = "db"
-						recorddata = record.split("|")
-
-						#in either dat type, patches are the last record
-						if len(recorddata) > 8 or len(recorddata) == 3:
-							if args.v:
-								print("Patch       :")
-							patches = recorddata[len(recorddata) - 1].split(",")
-							romarray = bytearray(romdata)
-							for patch in patches:
-								patch = patch.split("\n")[0] # remove any trailing newline char
-								address = int(patch.split("=")[0],16)
-								payload = patch.split("=")[1]
-								payloadbytes = bytes.fromhex(payload)
-								romarray[address:address+int(len(payloadbytes))] = payloadbytes
-								if args.v:
-									print(hex(address), "=", payload)
-							rom = romarray
-
-			# form memory map and write it to the emulator core
-			memorymap = b""
-			formmemorymap(loROM,romSize)
-			emulator[anchorfound+8:anchorfound+8+len(memorymap)] = memorymap
-			
-			# pad to snesRomPosition and add romdata
-			emulator += b"\0" * (snesRomPosition - len(emulator)) + rom
+				print("Patch       :")
+				for address, payload in spans:
+					print(hex(address), "=", payload.hex().upper())
+			for address in conflicts:
+				print("conflicting patches at", hex(address), "- using the first record's")
+			if args.ips:
+				writefile(romtitle + ".ips", ipspatch(spans, readrange(item, romdataoffset + 0x454F45, 1)), stream)
+
+		# form memory map, to be written into the emulator core
+		memorymap = formmemorymap(loROM, romSize, sramSizeBytes, snesRomPosition)
+		
+
+		if args.v:
+			print()
+		else:
+			print(db_match, outputtitle)
 
-			if args.v:
-				print()
+		# pad to snesRomPosition and add romdata
+		with CompilationWriter(outputfile, stream=stream) as output:
+			core.write(output, memorymap)
+			if not spans:
+				output.copyfrom(item)
 			else:
-				print(db_match, romtitle)
+				output.copypatched(item, spans, romdataoffset, romSize)
 
-			if args.outputfile and len(args.romfile) == 1:
-				outputfile = args.outputfile
-			else:
-				outputfile = romtitle + ".gba"
+		if args.pat:
+			# EZ-Flash IV fw2.x GSS patcher metadata to force 64KB SRAM saves - for PATCH folder on SD card
+			patchname = os.path.splitext(outputfile)[0] + ".pat"
+			patchdata = b'QlpoOTFBWSZTWRbvmZEAAAT44fyAgIAAEUAAAACIAAQAAAQESaAAVEIaaGRoxBKeqQD1GTJoks40324rSIskHSFhIywXzTCaqwSzf4exCBTgBk/i7kinChIC3fMyIA=='
+			writefile(patchname, bz2.decompress(base64.b64decode(patchdata)), stream)
 
-			writefile(outputfile, emulator)
+		if args.sav:
+			# EZ-Flash IV fw1.x blank save - for SAVER folder on SD card
+			savename = os.path.splitext(outputfile)[0] + ".sav"
+			saveempty = b"\xff" * SRAM_SAVE
+			if stream or not os.path.exists(savename): # careful not to overwrite an existing save
+				writefile(savename, saveempty, stream)
 
-			if args.pat:
-				# EZ-Flash IV fw2.x GSS patcher metadata to force 64KB SRAM saves - for PATCH folder on SD card
-				patchname = os.path.splitext(outputfile)[0] + ".pat"
-				patchdata = b'QlpoOTFBWSZTWRbvmZEAAAT44fyAgIAAEUAAAACIAAQAAAQESaAAVEIaaGRoxBKeqQD1GTJoks40324rSIskHSFhIywXzTCaqwSzf4exCBTgBk/i7kinChIC3fMyIA=='
-				writefile(patchname, bz2.decompress(base64.b64decode(patchdata)))
-
-			if args.sav:
-				# EZ-Flash IV fw1.x blank save - for SAVER folder on SD card
-				savename = os.path.splitext(outputfile)[0] + ".sav"
-				saveempty = b"\xff" * SRAM_SAVE
-				if not os.path.exists(savename): # careful not to overwrite an existing save
-					writefile(savename, saveempty)
+		if recipe:
+			writestamp(outputfile, recipe)
 
-		else:
-			raise Exception(f'unsupported filetype for compilation - {romfilename}')
+	else:
+		raise Exception('unsupported filetype for compilation') # named with the ROM by build()
+
+def startworker(emubinary, databases):
+	# each worker process maps the database indexes for itself - the pages are shared through the page cache
+	global workerstate
+	workerstate = (preparecore(emubinary), SuperDat(databases), databases)
+
+def buildinworker(args, item, single):
+	# the ROM's console output is returned rather than printed, so that the batch can print it in order
+	output = io.StringIO()
+	try:
+		with contextlib.redirect_stdout(output):
+			buildrom(args, item, single, *workerstate)
+	except Exception as error:
+		return output.getvalue(), f'{error} - {item.name}'
+	return output.getvalue(), None
+
+def build(args, stream=None, database=None, emubinary=None):
+
+	databases = args.database or [args.localpath + default_database]
+	if database is None:
+		database = SuperDat(databases)
+
+	if emubinary is None:
+		emubinary = readrange(args.emubinary, 0, filesize(args.emubinary)) # not read(), so the same file can be used for the next build
+
+	single = len(args.romfile) == 1
+
+	if args.j > 1 and not single and not stream:
+		# the ROMs are built in a pool of processes, and each ROM's output is printed in turn as it finishes. A ROM which
+		# fails is reported without stopping the rest
+		import concurrent.futures
+		workerargs = argparse.Namespace(**vars(args))
+		workerargs.emubinary = args.emubinary.name
+		workerargs.romfile = None
+		failures = 0
+		with concurrent.futures.ProcessPoolExecutor(args.j, initializer=startworker, initargs=(emubinary, databases)) as pool:
+			for output, failure in pool.map(buildinworker, itertools.repeat(workerargs), args.romfile, itertools.repeat(single)):
+				print(output, end="")
+				if failure:
+					print("failed -", failure)
+					failures += 1
+		if failures:
+			raise Exception(f'{failures} of {len(args.romfile)} ROMs failed')
+	else:
+		core = preparecore(emubinary)
+		for item in prefetch(args.romfile):
+			try:
+				buildrom(args, item, single, core, database, databases, stream)
+			except Exception as error:
+				raise Exception(f'{error} - {item.name}') from error
 
 	if args.v:
 		print("press L+R+Start for the emulator menu")
@@ -349,4 +490,18 @@ if __name__ == "__main__":
 		print("press L+R+Select+Down to cycle Forced BG Modes")
 
 
+if __name__ == "__main__":
+
+	if os.path.dirname(argv[0]) and os.path.dirname(argv[0]) != ".":
+		localpath = os.path.dirname(argv[0]) + os.path.sep
+	else:
+		localpath = ""
 
+	args = buildparser(localpath).parse_args()
+	args.romfile = findroms(args.romfile, rom_extensions, args.r)
+	stream = openstream(args, None)
+	if args.outputfile == "-" and len(args.romfile) > 1:
+		raise Exception('only a single ROM can be sent to stdout, use -tar to send several')
+	build(args, stream)
+	if stream:
+		stream.close()
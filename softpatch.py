@@ -0,0 +1,130 @@
+#!/usr/bin/python3
+
+import zlib
+
+# IPS, BPS and UPS patches, applied to a ROM in memory
+#
+# https://zerosoft.zophar.net/ips.php
+# https://www.romhacking.net/documents/746/ (BPS)
+# https://www.romhacking.net/documents/392/ (UPS)
+#
+# BPS and UPS patches carry CRC32s of the source ROM, the patched ROM and the patch itself, which are all checked - so a
+# patch made for a different revision of a game is refused rather than producing a broken ROM
+
+def readnumber(patch, position):
+	# the variable length numbers of BPS and UPS, returned with the position after them
+	number = 0
+	shift = 1
+	while True:
+		value = patch[position]
+		position += 1
+		number += (value & 0x7F) * shift
+		if value & 0x80:
+			return number, position
+		shift <<= 7
+		number += shift
+
+def checkfooter(source, patch, name):
+	sourcecrc, targetcrc, patchcrc = (int.from_bytes(patch[offset:offset + 4], byteorder='little') for offset in range(len(patch) - 12, len(patch), 4))
+	if zlib.crc32(patch[:-4]) != patchcrc:
+		raise Exception(f'patch is damaged - {name}')
+	if zlib.crc32(source) != sourcecrc:
+		raise Exception(f'patch is for a different ROM - {name}')
+	return targetcrc
+
+def applyips(source, patch, name):
+	target = bytearray(source)
+	position = 5
+	while patch[position:position + 3] != b"EOF":
+		if position + 5 > len(patch):
+			raise Exception(f'patch is damaged - {name}')
+		offset = int.from_bytes(patch[position:position + 3], byteorder='big')
+		size = int.from_bytes(patch[position + 3:position + 5], byteorder='big')
+		position += 5
+		if size:
+			data = patch[position:position + size]
+			position += size
+		else:
+			# run length encoded
+			size = int.from_bytes(patch[position:position + 2], byteorder='big')
+			data = patch[position + 2:position + 3] * size
+			position += 3
+		if offset > len(target):
+			target += bytes(offset - len(target))
+		target[offset:offset + size] = data
+	if len(patch) >= position + 6:
+		del target[int.from_bytes(patch[position + 3:position + 6], byteorder='big'):] # truncation extension
+	return bytes(target)
+
+def applyups(source, patch, name):
+	targetcrc = checkfooter(source, patch, name)
+	sourcesize, position = readnumber(patch, 4)
+	targetsize, position = readnumber(patch, position)
+	target = bytearray(source[:targetsize])
+	target += bytes(targetsize - len(target))
+	output = 0
+	while position < len(patch) - 12:
+		skip, position = readnumber(patch, position)
+		output += skip
+		end = patch.index(b"\0", position)
+		for value in patch[position:end]:
+			if output < targetsize:
+				target[output] ^= value
+			output += 1
+		output += 1 # the terminating zero, which leaves its byte unchanged
+		position = end + 1
+	if zlib.crc32(target) != targetcrc:
+		raise Exception(f'patched ROM fails its checksum - {name}')
+	return bytes(target)
+
+def applybps(source, patch, name):
+	targetcrc = checkfooter(source, patch, name)
+	sourcesize, position = readnumber(patch, 4)
+	targetsize, position = readnumber(patch, position)
+	metadatasize, position = readnumber(patch, position)
+	position += metadatasize
+	target = bytearray(targetsize)
+	output = 0
+	sourceoffset = 0
+	targetoffset = 0
+	while position < len(patch) - 12:
+		action, position = readnumber(patch, position)
+		command = action & 3
+		length = (action >> 2) + 1
+		if command == 0:
+			# SourceRead
+			target[output:output + length] = source[output:output + length]
+		elif command == 1:
+			# TargetRead
+			target[output:output + length] = patch[position:position + length]
+			position += length
+		elif command == 2:
+			# SourceCopy
+			offset, position = readnumber(patch, position)
+			sourceoffset += -(offset >> 1) if offset & 1 else offset >> 1
+			target[output:output + length] = source[sourceoffset:sourceoffset + length]
+			sourceoffset += length
+		else:
+			# TargetCopy - the copy can overlap what it is writing, repeating a pattern
+			offset, position = readnumber(patch, position)
+			targetoffset += -(offset >> 1) if offset & 1 else offset >> 1
+			if targetoffset + length <= output:
+				target[output:output + length] = target[targetoffset:targetoffset + length]
+			else:
+				for count in range(length):
+					target[output + count] = target[targetoffset + count]
+			targetoffset += length
+		output += length
+	if zlib.crc32(target) != targetcrc:
+		raise Exception(f'patched ROM fails its checksum - {name}')
+	return bytes(target)
+
+def applypatch(source, patch, name):
+	# the ROM data with the patch applied, whichever of the formats it is in
+	if patch[:5] == b"PATCH":
+		return applyips(source, patch, name)
+	if patch[:4] == b"UPS1":
+		return applyups(source, patch, name)
+	if patch[:4] == b"BPS1":
+		return applybps(source, patch, name)
+	raise Exception(f'unsupported patch format - {name}')
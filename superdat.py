@@ -0,0 +1,144 @@
+#!/usr/bin/python3
+
+import struct
+from romio import readindex, writeindex
+
+# SuperDAT databases for the SNES builders
+#
+# SNESAdvance SuperDAT (snesadvance.dat, snesadvance2.dat)
+# CRC32|title|flags1|flags2|autoscroll1|autoscroll2|scale|offset[|patches]
+#
+# snezziboy.dat
+# CRC32|title|patches
+#
+# each DAT file is compiled into an index which is cached (see romio.readindex) - a table of (CRC32, offset, length)
+# entries sorted by CRC32, followed by the records themselves. The index is memory mapped and binary searched, so a
+# lookup only touches a few pages of it however large the DAT is. Records keep their order from the DAT within a CRC32
+
+index_magic = b"SDX1"
+index_entry_format = "<III"
+
+def compileindex(name):
+	entries = []
+	blob = bytearray()
+	with open(name, encoding='latin-1') as fh:
+		for record in fh:
+			record = record.rstrip("\r\n")
+			try:
+				crc = int(record.split("|")[0], 16)
+			except ValueError:
+				continue # the header line, or anything else which isn't a game
+			encoded = record.encode('latin-1')
+			entries.append((crc, len(blob), len(encoded)))
+			blob += encoded
+	entries.sort(key=lambda entry: entry[0]) # a stable sort, so the records for each CRC32 stay in file order
+	table = b"".join(struct.pack(index_entry_format, *entry) for entry in entries)
+	return struct.pack("<I", len(entries)) + table + bytes(blob)
+
+class SuperDat:
+	# one or more DAT files, merged - the records from the first file come first for any CRC32, so it takes precedence
+
+	def __init__(self, names):
+		if isinstance(names, str):
+			names = [names]
+		self.indexes = []
+		for name in names:
+			index = readindex(name, index_magic, mapped=True)
+			if index is None or not self.valid(index):
+				index = compileindex(name)
+				writeindex(name, index_magic, index)
+			self.indexes.append(index)
+
+	def valid(self, index):
+		if len(index) < 4:
+			return False
+		count = struct.unpack_from("<I", index)[0]
+		return len(index) >= 4 + count * struct.calcsize(index_entry_format)
+
+	def lookup(self, crc):
+		# the records for the CRC32, each split into its fields
+		records = []
+		entrysize = struct.calcsize(index_entry_format)
+		for index in self.indexes:
+			count = struct.unpack_from("<I", index)[0]
+			blob = 4 + count * entrysize
+			low, high = 0, count
+			while low < high:
+				middle = (low + high) // 2
+				if struct.unpack_from("<I", index, 4 + middle * entrysize)[0] < crc:
+					low = middle + 1
+				else:
+					high = middle
+			while low < count:
+				entrycrc, offset, length = struct.unpack_from(index_entry_format, index, 4 + low * entrysize)
+				if entrycrc != crc:
+					break
+				records.append(bytes(index[blob + offset:blob + offset + length]).decode('latin-1').split("|"))
+				low += 1
+		return records
+
+	def records(self):
+		# every (CRC32, fields) record, file by file
+		entrysize = struct.calcsize(index_entry_format)
+		for index in self.indexes:
+			count = struct.unpack_from("<I", index)[0]
+			blob = 4 + count * entrysize
+			for crc, offset, length in struct.iter_unpack(index_entry_format, index[4:blob]):
+				yield crc, bytes(index[blob + offset:blob + offset + length]).decode('latin-1').split("|")
+
+def compilepatches(patchlists):
+	# patch lists (address=HEX,address=HEX,...) in order of precedence, compiled into sorted, non-overlapping
+	# (address, bytes) spans. Within a list the patches are applied in order, so a later one overwrites an earlier one
+	# (some records patch an address twice, e.g. FF6 (J) replacing its own speed hacks with NOPs). Where two lists set
+	# the same byte differently the first list's is kept, and the address is returned among the conflicts
+	patched = {}
+	conflicts = []
+	for patchlist in patchlists:
+		listpatched = {}
+		for patch in patchlist.split(","):
+			if not patch:
+				continue
+			address = int(patch.split("=")[0],16)
+			payloadbytes = bytes.fromhex(patch.split("=")[1])
+			for position, value in enumerate(payloadbytes, address):
+				listpatched[position] = value
+		conflicting = None # the last conflicting byte, so a run of them is reported once at its start
+		for position in sorted(listpatched):
+			value = listpatched[position]
+			if position not in patched:
+				patched[position] = value
+			elif patched[position] != value:
+				if conflicting != position - 1:
+					conflicts.append(position)
+				conflicting = position
+	spans = []
+	for position in sorted(patched):
+		if spans and spans[-1][0] + len(spans[-1][1]) == position:
+			spans[-1][1].append(patched[position])
+		else:
+			spans.append((position, bytearray([patched[position]])))
+	return [(address, bytes(payload)) for address, payload in spans], conflicts
+
+def ipspatch(spans, eofbyte=None):
+	# the spans as an IPS patch. A record can't start at 0x454F46, which reads as the "EOF" marker, so a record which
+	# would is started a byte earlier - taking that byte from the span, or if the span starts there from eofbyte, the
+	# ROM's own byte at 0x454F45
+	# https://zerosoft.zophar.net/ips.php
+	patch = bytearray(b"PATCH")
+	for address, payload in spans:
+		if address + len(payload) > 0x1000000:
+			raise Exception(f'patch beyond the 16MB reach of IPS - {hex(address)}')
+		if address == 0x454F46:
+			if not eofbyte:
+				raise Exception('a patch at 0x454F46 can only be exported with the byte before it from the ROM')
+			address -= 1
+			payload = eofbyte + payload
+		start = 0
+		while start < len(payload):
+			if address + start == 0x454F46:
+				start -= 1
+			part = payload[start:start + 0xFFFF]
+			patch += (address + start).to_bytes(3, "big") + len(part).to_bytes(2, "big") + part
+			start += len(part)
+	patch += b"EOF"
+	return bytes(patch)
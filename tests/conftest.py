@@ -0,0 +1,4 @@
+import os, sys
+
+# the scripts are run from the repository root rather than installed, so the tests import them from there
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
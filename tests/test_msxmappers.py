@@ -0,0 +1,67 @@
+import random, struct
+import pytest
+from msxadvance_compile import mapper_writes, mapperwrites, detectmapper
+
+def bytelooptally(romdata):
+	# the byte at a time loop which detectmapper() used before, kept as the reference for the counts
+	size = len(romdata)
+	typeGuess = {
+		'KONAMI4' : 0,
+		'KONAMI5' : 0,
+		'ASCII8K'  : 0,
+		'ASCII16K' : 0,
+	}
+	for i in range(0,size - 3):
+		if romdata[i] == 0x32:
+			value = struct.unpack("<H", romdata[i + 1:i + 3])[0]
+			if value == 0x5000 or value == 0x9000 or value == 0xb000:
+				typeGuess['KONAMI5'] += 1
+			elif value == 0x4000 or value == 0x8000 or value == 0xa000:
+				typeGuess['KONAMI4'] += 1
+			elif value == 0x6800 or value == 0x7800:
+				typeGuess['ASCII8K'] += 1
+			elif value == 0x6000:
+				typeGuess['KONAMI4'] += 1
+				typeGuess['ASCII8K'] += 1
+				typeGuess['ASCII16K'] += 1
+			elif value == 0x7000:
+				typeGuess['KONAMI5'] += 1
+				typeGuess['ASCII8K'] += 1
+				typeGuess['ASCII16K'] += 1
+			elif value == 0x77ff:
+				typeGuess['ASCII16K'] += 1
+	return typeGuess
+
+def craftedrom(seed, size):
+	# random data with mapper writes scattered through it, including runs of them and one at each end of the ROM
+	generator = random.Random(seed)
+	romdata = bytearray(generator.randbytes(size))
+	addresses = list(mapper_writes) + [0x1234, 0x3232]
+	for count in range(generator.randrange(50, 400)):
+		position = generator.randrange(0, size - 3)
+		romdata[position:position + 3] = b"\x32" + struct.pack("<H", generator.choice(addresses))
+	for position in (0, size - 4, size - 3):
+		romdata[position:position + 3] = b"\x32" + struct.pack("<H", generator.choice(addresses))
+	return bytes(romdata[:size])
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_rom(seed):
+	romdata = random.Random(seed).randbytes(0x20000)
+	assert mapperwrites(romdata) == bytelooptally(romdata)
+
+@pytest.mark.parametrize("seed", range(40))
+def test_crafted_rom(seed):
+	romdata = craftedrom(seed, random.Random(seed).choice((0x10000, 0x20000, 0x40000)) + 0x10000)
+	assert mapperwrites(romdata) == bytelooptally(romdata)
+
+def test_back_to_back_writes():
+	romdata = (b"\x32\x00\x60" * 100 + b"\x32\x00\x50" * 50 + b"\x32\x00\x68" * 30).ljust(0x20000, b"\xff")
+	assert mapperwrites(romdata) == bytelooptally(romdata) == {'KONAMI4': 100, 'KONAMI5': 50, 'ASCII8K': 130, 'ASCII16K': 100}
+	assert detectmapper(romdata) == 'ASCII8K'
+
+def test_write_in_last_bytes():
+	# neither scanner counts a write in the ROM's last 3 bytes
+	romdata = bytes(0x20000 - 3) + b"\x32\x00\x50"
+	assert mapperwrites(romdata) == bytelooptally(romdata) == {'KONAMI4': 0, 'KONAMI5': 0, 'ASCII8K': 0, 'ASCII16K': 0}
+	romdata = bytes(0x20000 - 4) + b"\x32\x00\x50\x00"
+	assert mapperwrites(romdata) == bytelooptally(romdata) == {'KONAMI4': 0, 'KONAMI5': 1, 'ASCII8K': 0, 'ASCII16K': 0}
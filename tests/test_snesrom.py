@@ -0,0 +1,24 @@
+import random
+import pytest
+from snesrom import checksum
+
+def snes9x_mirror_sum(rom, start, length, mask=0x800000):
+	# checksum_mirror_sum from snes9x's memmap.cpp, ported line for line - length is passed by reference there, which
+	# is returned here with the sum
+	while not (length & mask) and mask:
+		mask >>= 1
+	part1 = sum(rom[start:start + mask]) & 0xFFFF
+	part2 = 0
+	next_length = length - mask
+	if next_length:
+		part2, next_length = snes9x_mirror_sum(rom, start + mask, next_length, mask >> 1)
+		while next_length < mask:
+			next_length += next_length
+			part2 = (part2 + part2) & 0xFFFF
+		length = mask + mask
+	return (part1 + part2) & 0xFFFF, length
+
+@pytest.mark.parametrize("size", [0x100000, 0x140000, 0x180000, 0x1C0000, 0x280000, 0x300000, 0x380000, 0x600000, 0x700000])
+def test_checksum_matches_snes9x(size):
+	rom = random.Random(size).randbytes(size)
+	assert checksum(rom) == snes9x_mirror_sum(rom, 0, size)[0]
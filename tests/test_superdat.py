@@ -0,0 +1,22 @@
+from superdat import compilepatches
+
+def test_record_overwriting_itself():
+	# FF6 (J) in the shipped DATs - within a record the later patch wins, and that isn't a conflict
+	spans, conflicts = compilepatches(["B6D8=421B,B6D8=EAEA,B73F=421B,B73F=EAEA,568=42FC"])
+	assert spans == [(0x568, b"\x42\xFC"), (0xB6D8, b"\xEA\xEA"), (0xB73F, b"\xEA\xEA")]
+	assert conflicts == []
+
+def test_partial_overwrite_within_record():
+	spans, conflicts = compilepatches(["10=AABBCC,11=DD"])
+	assert spans == [(0x10, b"\xAA\xDD\xCC")]
+	assert conflicts == []
+
+def test_first_record_wins():
+	spans, conflicts = compilepatches(["10=AABB,20=11", "10=CCDD,12=EE,20=11"])
+	assert spans == [(0x10, b"\xAA\xBB\xEE"), (0x20, b"\x11")]
+	assert conflicts == [0x10]
+
+def test_conflicts_reported_per_run():
+	spans, conflicts = compilepatches(["10=AABB,20=CC", "10=0102,20=03"])
+	assert spans == [(0x10, b"\xAA\xBB"), (0x20, b"\xCC")]
+	assert conflicts == [0x10, 0x20]
@@ -0,0 +1,112 @@
+#!/usr/bin/python3
+
+import re, collections, itertools
+
+# fuzzy title matching, for ROMs whose CRC32 isn't in a database - hacks, translations, bad or alternate dumps - so
+# that they can still get the settings of the game they were made from
+#
+# titles are cleaned (lower case, without the bracketed parts and punctuation) and compared by their sets of trigrams
+# using the Dice coefficient, 2 * shared / (trigrams in one + trigrams in the other). An inverted index from each
+# trigram to the titles containing it means only titles which share a trigram with the name are ever scored
+#
+# sequels and sister games share nearly all their trigrams ("Final Fantasy II" and "Final Fantasy III"), so the numbers
+# in two titles - digits or roman numerals - must be the same for them to match. Of the titles which match, one from the
+# same region as the name is preferred, then the most alike, then the first in alphabetical order
+
+FUZZY_THRESHOLD = 0.8 # the Dice coefficient needed for a match, 1.0 being the same cleaned title
+
+def cleantitle(title):
+	title = title.split(" [")[0] # strip the square bracket parts of the name
+	title = title.split(" (")[0] # strip the bracket parts of the name
+	return " ".join(re.findall("[a-z0-9]+", title.lower()))
+
+roman_numeral = re.compile("x{0,3}(ix|iv|v?i{0,3})") # I to XXXIX, which is as far as game sequels go
+roman_values = {"i": 1, "v": 5, "x": 10}
+# region tags, as GoodTools and No-Intro write them
+region_tags = {
+	"u": "USA", "usa": "USA", "us": "USA", "ntsc": "USA",
+	"e": "Europe", "europe": "Europe", "eur": "Europe", "pal": "Europe",
+	"j": "Japan", "japan": "Japan", "jpn": "Japan", "jp": "Japan",
+	"w": "World", "world": "World", "f": "France", "france": "France", "g": "Germany", "germany": "Germany",
+	"k": "Korea", "korea": "Korea", "s": "Spain", "spain": "Spain", "i": "Italy", "italy": "Italy",
+	"a": "Australia", "australia": "Australia", "b": "Brazil", "brazil": "Brazil", "c": "China", "china": "China",
+}
+
+def romanvalue(numeral):
+	value = 0
+	for position, letter in enumerate(numeral):
+		if position + 1 < len(numeral) and roman_values[letter] < roman_values[numeral[position + 1]]:
+			value -= roman_values[letter]
+		else:
+			value += roman_values[letter]
+	return value
+
+def numbers(title):
+	# the numbers in the cleaned title, with roman numerals as digits - "Mega Man X2" has x2, "Final Fantasy III" has 3
+	found = []
+	for word in cleantitle(title).split():
+		if word.isdigit():
+			found.append(str(int(word)))
+		elif roman_numeral.fullmatch(word):
+			found.append(str(romanvalue(word)))
+		elif any(letter.isdigit() for letter in word):
+			found.append(word)
+	return tuple(sorted(found))
+
+def region(title):
+	# the first region tag in the title's brackets, e.g. USA for "Contra (U) [!]", or None if it hasn't one
+	for tags in re.findall("[(]([^)]*)[)]", title):
+		for tag in re.split("[,/ ]+", tags.lower()):
+			if tag in region_tags:
+				return region_tags[tag]
+	return None
+
+def trigrams(title):
+	padded = "  " + cleantitle(title) + " "
+	return {padded[position:position + 3] for position in range(len(padded) - 2)}
+
+class TitleIndex:
+
+	def __init__(self, entries):
+		# entries are (key, title) pairs - the key of the best match is returned
+		self.keys = []
+		self.titles = []
+		self.sizes = []
+		self.numbers = []
+		self.regions = []
+		self.postings = {}
+		for key, title in entries:
+			grams = trigrams(title)
+			if not grams:
+				continue
+			number = len(self.keys)
+			self.keys.append(key)
+			self.titles.append(title)
+			self.sizes.append(len(grams))
+			self.numbers.append(numbers(title))
+			self.regions.append(region(title))
+			for gram in grams:
+				self.postings.setdefault(gram, []).append(number)
+
+	def match(self, title, threshold=FUZZY_THRESHOLD):
+		# the key of the title most like this one, and how alike they are - or None if nothing reaches the threshold
+		grams = trigrams(title)
+		titlenumbers = numbers(title)
+		titleregion = region(title)
+		shared = collections.Counter(itertools.chain.from_iterable(self.postings.get(gram, ()) for gram in grams))
+		# a title can't have more trigrams than it shares, so reaching the threshold needs at least this many in common
+		needed = threshold * len(grams) / (2 - threshold)
+		best = None
+		bestrank = None
+		for number, count in shared.items():
+			if count >= needed and self.numbers[number] == titlenumbers:
+				score = 2 * count / (len(grams) + self.sizes[number])
+				if score >= threshold:
+					sameregion = titleregion is not None and self.regions[number] == titleregion
+					rank = (not sameregion, -score, self.titles[number], str(self.keys[number]))
+					if bestrank is None or rank < bestrank:
+						best = number
+						bestrank = rank
+		if best is None:
+			return None
+		return self.keys[best], -bestrank[1]
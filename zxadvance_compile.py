@@ -2,6 +2,7 @@
 
 import sys, os.path, struct, argparse, bz2, base64, configparser
 from sys import argv
+from romio import findroms, CompilationWriter, filesize, prefetch, writeatomic, openstream, preloaded
 
 EMU_HEADER = 32
 SRAM_SAVE = 65536
@@ -11,6 +12,7 @@ default_emubinary = "zxa.gba"
 clean_emubinary = "zxa-clean.gba"
 pogo_plugin = "zxa-pogo.gba"
 default_inifile = "ZXA.INI"
+rom_extensions = (".z80", ".sna") # accepted when searching folders and wildcards
 original_binaries = [ "ZXAdvance 1.0.1.exe", "ZXAdvance 1.0.1a.exe" ]
 header_struct_format = "<15sxIBx10B" # https://docs.python.org/3/library/struct.html
 pogo_header_struct_format = "<31sx10B"
@@ -65,11 +67,13 @@ def readfile(name):
 		contents = fh.read()
 	return contents
 
-def writefile(name, contents):
-	with open(name, "wb") as fh:
-		fh.write(contents)
-		if name == default_outputfile:
-			print("...wrote", name) 
+def writefile(name, contents, stream=None):
+	if stream:
+		stream.addfile(name, contents)
+	else:
+		writeatomic(name, contents)
+	if name == default_outputfile:
+		print("...wrote", name)
 
 def pogoheader(name, keys):
 	header = struct.pack(
@@ -89,24 +93,25 @@ def pogoheader(name, keys):
 #    return value & ~(1 << n)
 
 
-if __name__ == "__main__":
-
-	if os.path.dirname(argv[0]) and os.path.dirname(argv[0]) != ".":
-		localpath = os.path.dirname(argv[0]) + os.path.sep
-	else:
-		localpath = ""
+def buildparser(localpath=""):
 
 	parser = argparse.ArgumentParser(
+		fromfile_prefix_chars = '@',
 		description="This script will assemble the ZXAdvance emulator and Z80/SNA snapshots into a Gameboy Advance ROM image. It is recommended to type the script name, then drag and drop multiple ROM files onto the shell window, then add any additional arguments as needed.",
 		epilog="coded by patters in 2023"
 	)
 
 	parser.add_argument(
 		dest = 'romfile',
-		help = ".z80/.sna files to add to the compilation. Drag and drop multiple files onto your shell window.",
-		type = argparse.FileType('rb'),
+		help = ".z80/.sna files to add to the compilation. Drag and drop multiple files onto your shell window. Folders and wildcards are also accepted, or use @listfile to read them from a text file, one per line.",
+		type = str,
 		nargs = '*' # allow no romfile when extracting the emulator from the original .exe file 
 	)
+	parser.add_argument(
+		'-r',
+		help = "search folders recursively for ROMs",
+		action = 'store_true'
+	)
 	parser.add_argument(
 		'-e', 
 		dest = 'emubinary',
@@ -126,10 +131,15 @@ if __name__ == "__main__":
 	parser.add_argument(
 		'-o',
 		dest = 'outputfile',
-		help = "compilation output filename, defaults to " + default_outputfile,
+		help = "compilation output filename, defaults to " + default_outputfile + ", or - to send it to stdout",
 		type = str,
 		default = default_outputfile
 	)
+	parser.add_argument(
+		'-tar',
+		help = "send the compilation and its .pat/.sav files to stdout as a tar archive, instead of writing them as files",
+		action = 'store_true'
+	)
 	parser.add_argument(
 		'-p',
 		help = "create Pogoshell plugin using the game configurations from ZXA.INI, outputs to " + pogo_plugin,
@@ -150,17 +160,18 @@ if __name__ == "__main__":
 		help = "for EZ-Flash IV firmware 2.x - create a .pat file for the compilation to force 64KB SRAM saves, store in the PATCH folder",
 		action = 'store_true'
 	)
+	return parser
 
+def build(args, stream=None, emubinary=None):
 
-	args = parser.parse_args()
-
-	emubinaryfilename = os.path.split(args.emubinary.name)[1]
+	emu = preloaded(args.emubinary, emubinary)
+	emubinaryfilename = os.path.split(emu.name)[1]
 
 	if emubinaryfilename in original_binaries:
 		
 		# extract emulator binary
-		args.emubinary.seek(0xB0B04)
-		emubin = bytearray(args.emubinary.read(0x23D70))
+		emu.seek(0xB0B04)
+		emubin = bytearray(emu.read(0x23D70))
 		emubin[0x30C] = 0                             # patch to disable intro (already 0 in v1.0.1a, which is the only difference)
 		writefile(clean_emubinary, emubin)
 		print("...wrote", clean_emubinary)
@@ -182,7 +193,7 @@ if __name__ == "__main__":
 
 		writefile(default_emubinary, emubin)
 		print("...wrote", default_emubinary, "(fixed header, exit-patched)")
-		quit()
+		return True
 
 	elif args.p:
 		# create Pogoshell plugin
@@ -236,14 +247,15 @@ if __name__ == "__main__":
 			with open(args.inifile, "w") as ini_output:
 				new_config.write(ini_output, space_around_delimiters=False)
 		else:
-			parser.print_usage()
+			return False
 
 	elif not args.romfile:
-		parser.print_usage()
+		return False
 
 	else:
 		# build a compilation
-		roms = bytes()
+		roms = []
+		pads = []
 		headers = bytes()
 		# there is one blank header between the last header and the first ROM data
 		headers_size = (len(args.romfile) + 1 ) * EMU_HEADER
@@ -263,6 +275,7 @@ if __name__ == "__main__":
 
 			keys = default_controls
 			controlscheme = ""
+			name = romtitle[:15].ljust(15)
 
 			if os.path.exists(args.inifile):
 				# read controls mappings from ZXA.INI, if present
@@ -278,11 +291,10 @@ if __name__ == "__main__":
 						schemeconfig = config[schemesectionname]
 						keys = dict(schemeconfig)
 					name = gameconfig['filename'][:15].ljust(15)
-				else:
-					name = romtitle[:15].ljust(15)
 
-			rom = item.read()
-			rom += b"\0" * ((4 - (len(rom)%4))%4) # 4 byte alignment
+			# the headers hold the offset of each ROM, so only the sizes are needed up front - the ROM data is streamed afterwards
+			romsize = filesize(item)
+			rompad = (4 - (romsize%4))%4 # 4 byte alignment
 
 			fileheader = struct.pack(
 				header_struct_format, name.encode('ascii'), offset, filetype,
@@ -292,24 +304,52 @@ if __name__ == "__main__":
 			)
 
 			headers += fileheader
-			roms += rom
-			offset += len(rom)
+			roms.append(item)
+			pads.append(rompad)
+			offset += romsize + rompad
 			print('{:<16}{:<4}{}'.format(name,romtype.strip('.').lower(),controlscheme))
 
 		blankheader = b'\0' * EMU_HEADER
-		compilation = args.emubinary.read() + headers + blankheader + roms
 
-		writefile(args.outputfile, compilation)
+		with CompilationWriter(args.outputfile, stream=stream) as compilation:
+			compilation.copyfrom(emu)
+			compilation.write(headers + blankheader)
+			for item, rompad in zip(prefetch(roms), pads):
+				compilation.copyfrom(item)
+				compilation.pad(rompad)
+				compilation.checkpoint()
+
+		if args.outputfile == default_outputfile:
+			print("...wrote", args.outputfile)
 
 		if args.pat:
 			# EZ-Flash IV fw2.x GSS patcher metadata to force 64KB SRAM saves - for PATCH folder on SD card
 			patchname = os.path.splitext(args.outputfile)[0] + ".pat"
 			patchdata = b'QlpoOTFBWSZTWRbvmZEAAAT44fyAgIAAEUAAAACIAAQAAAQESaAAVEIaaGRoxBKeqQD1GTJoks40324rSIskHSFhIywXzTCaqwSzf4exCBTgBk/i7kinChIC3fMyIA=='
-			writefile(patchname, bz2.decompress(base64.b64decode(patchdata)))
+			writefile(patchname, bz2.decompress(base64.b64decode(patchdata)), stream)
 
 		if args.sav:
 			# EZ-Flash IV fw1.x blank save - for SAVER folder on SD card
 			savename = os.path.splitext(args.outputfile)[0] + ".sav"
 			saveempty = b"\xff" * SRAM_SAVE
-			if not os.path.exists(savename): # careful not to overwrite an existing save
-				writefile(savename, saveempty)
+			if stream or not os.path.exists(savename): # careful not to overwrite an existing save
+				writefile(savename, saveempty, stream)
+
+	return True
+
+
+if __name__ == "__main__":
+
+	if os.path.dirname(argv[0]) and os.path.dirname(argv[0]) != ".":
+		localpath = os.path.dirname(argv[0]) + os.path.sep
+	else:
+		localpath = ""
+
+	parser = buildparser(localpath)
+	args = parser.parse_args()
+	args.romfile = findroms(args.romfile, rom_extensions, args.r)
+	stream = openstream(args, default_outputfile)
+	if not build(args, stream):
+		parser.print_usage()
+	if stream:
+		stream.close()